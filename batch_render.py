@@ -0,0 +1,242 @@
+"""公欠届の一括作成（GUIなし）
+
+使い方:
+    python batch_render.py records.jsonl -o output --type out --workers 4
+    python batch_render.py records.jsonl -o all.pdf --output-mode pdf
+    python batch_render.py records.jsonl -o archive --encoder jpeg-small
+    python batch_render.py records.jsonl --encoder-report
+    python batch_render.py records.jsonl -o all.pdf --output-mode pdf --partial drop
+    python batch_render.py records.jsonl --validate-only
+
+入力はJSONLまたはCSVで、1行が片側1枚分のフォーム（プロファイルと同じ形式）。
+form_data.dump_records() で書き出した行形式のファイル（.records）も読める。
+位置JSONに定義された面（left / right など）に先頭から順に割り当てて1枚の画像にする。
+最後の1枚が埋まらない場合は --partial で扱いを選ぶ（imposition.py）。
+描画の前に全レコードをまとめて確認し（validation.py）、エラーがあれば描画しない。
+出力は1枚ごとのファイル、または全ページをまとめたPDF・マルチページTIFF。
+"""
+import argparse
+import collections
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import template_cache
+from encoders import DEFAULT_ENCODER, ENCODERS
+from render_cache import default_cache, template_fingerprint
+import form_data
+from imposition import PARTIAL_POLICIES, check_slots, impose, read_slots
+from reference_data import ReferenceData
+from render_core import compare_encoders_for, render_slots
+from settings import SUBJECT_COUNT
+from sheet_output import OUTPUT_MODES, encode_page, open_output, page_info, save_sheet
+from validation import validate_records
+
+# ワーカープロセスごとの申請書の種類とエンコーダー
+_worker_state = {}
+
+
+def load_records(path):
+    """JSONL・CSV・行形式（.records）からフォームの入力値をFormRecordのリストとして読み込む"""
+    lower = path.lower()
+    if lower.endswith(".records"):
+        with open(path, "r", encoding="utf-8") as f:
+            return form_data.load_records(f)
+    if lower.endswith(".csv"):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            return form_data.records_from_profiles(_record_from_csv_row(row) for row in csv.DictReader(f))
+
+    with open(path, "r", encoding="utf-8") as f:
+        return form_data.records_from_profiles(
+            _record_from_json_line(path, number, line) for number, line in enumerate(f, 1) if line.strip()
+        )
+
+
+def _record_from_json_line(path, number, line):
+    """JSONLの1行をプロファイル形式の辞書として読む。形式が違えば行番号付きの ValueError"""
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"{path}:{number}: JSONとして読めません: {e}") from None
+    if not isinstance(record, dict):
+        raise ValueError(f"{path}:{number}: 1行に1つのJSONオブジェクトを書いてください")
+    subjects = record.get("subjects")
+    if subjects is not None and not (isinstance(subjects, list) and all(isinstance(sub, dict) for sub in subjects)):
+        raise ValueError(f"{path}:{number}: subjects は {{\"subject\", \"teacher\"}} のオブジェクトのリストにしてください")
+    return record
+
+
+def _record_from_csv_row(row):
+    """CSVの1行をプロファイル形式に変換する（科目は subject1, teacher1 ... の列）"""
+    record = {k: v for k, v in row.items() if k and not k.startswith(("subject", "teacher"))}
+    record["subjects"] = [
+        {"subject": row.get(f"subject{i}", "") or "", "teacher": row.get(f"teacher{i}", "") or ""}
+        for i in range(1, SUBJECT_COUNT + 1)
+    ]
+    return record
+
+
+def _init_worker(application_type, encoder):
+    _worker_state["application_type"] = application_type
+    _worker_state["encoder"] = encoder
+    template_cache.warm([application_type])
+
+
+def _render_one(job):
+    output_path, page_format, form_slots = job
+    img = render_slots(_worker_state["application_type"], form_slots)
+    if page_format is None:
+        save_sheet(img, output_path, _worker_state["encoder"])
+        return None
+    return encode_page(img, page_format, _worker_state["encoder"])
+
+
+def _finish(sink, cache, key, output_path, result):
+    """描画済み（またはキャッシュ済み）の1枚を出力先に書き込む"""
+    if isinstance(result, Future):
+        page = result.result()
+        if sink.page_format is None:
+            if cache is not None:
+                cache.put_file(key, output_path)
+        else:
+            if cache is not None:
+                cache.put(key, page[0])
+            sink.add_encoded(*page)
+    elif sink.page_format is None:
+        with open(output_path, "wb") as f:
+            f.write(result)
+    else:
+        sink.add_encoded(result, *page_info(result))
+
+
+def resolve_slots(application_type, slots=None):
+    """使う面の名前を返す（Noneなら位置JSONのすべての面）。位置JSONにない面・重複した面はエラー"""
+    available = read_slots(application_type)
+    slots = tuple(slots or available)
+    check_slots(slots)
+    unknown = [slot for slot in slots if slot not in available]
+    if unknown:
+        raise ValueError(f"位置JSONにない面です: {', '.join(unknown)}（{', '.join(available)}）")
+    return slots
+
+
+def validate_batch(records, application_type="out", slots=None):
+    """科目・名簿を読み込み、描画前のチェックを行ってレポートを返す"""
+    reference = ReferenceData()
+    _, errors = reference.poll()
+    report = validate_records(records, reference, application_type, resolve_slots(application_type, slots))
+    for path, e in errors:
+        report.notes.append(f"{path} を読み込めません: {e}")
+    return report
+
+
+def render_batch(records, output, application_type="out", workers=None, mode="files", encoder=None, cache=None,
+                 slots=None, partial="blank"):
+    """レコード（FormRecordのリストまたはイテレーター）を一括で描画して出力する
+
+    mode が 'files' なら output はディレクトリで1枚ごとに保存し、
+    'pdf' / 'tiff' なら output に全ページを1ページずつ書き込む。
+    slots は面の名前の並び（Noneなら位置JSONのすべての面）、partial は
+    最後の1枚が埋まらない場合の扱い（imposition.PARTIAL_POLICIES）。
+    cache を渡すと、作成済みと同じ内容の1枚は描画せずキャッシュを使う。
+    戻り値は (作成した枚数, 経過秒数)
+    """
+    workers = workers or os.cpu_count() or 1
+    slots = resolve_slots(application_type, slots)
+    fingerprint = template_fingerprint(application_type) if cache is not None else None
+    start = time.perf_counter()
+    with open_output(mode, output, encoder) as sink, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(application_type, encoder)) as executor:
+        variant = f"{encoder or ''}:{sink.page_format or 'file'}"
+        pending = collections.deque() # 出力順を保つため、投入順に処理する
+        for sheet in impose(records, slots, partial):
+            form_slots = {slot: record.to_drawer_data() for slot, record in sheet.items()}
+            output_path = sink.next_path() if sink.page_format is None else None
+
+            key = result = None
+            if cache is not None:
+                key = cache.slots_key(application_type, form_slots, variant, fingerprint)
+                result = cache.get(key)
+            if result is None:
+                job = (output_path, sink.page_format, form_slots)
+                result = executor.submit(_render_one, job)
+            pending.append((key, output_path, result))
+
+            # 処理待ちを workers * 2 件までに抑え、メモリの使用量を一定にする
+            while len(pending) > workers * 2:
+                _finish(sink, cache, *pending.popleft())
+        while pending:
+            _finish(sink, cache, *pending.popleft())
+        count = sink.count
+    return count, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="公欠届を一括で作成します")
+    parser.add_argument("records", help="入力ファイル (.jsonl / .csv / .records)")
+    parser.add_argument("-o", "--output", default="output",
+                        help="出力先（files: ディレクトリ, pdf/tiff: ファイル）")
+    parser.add_argument("--output-mode", choices=OUTPUT_MODES, default="files",
+                        help="files: 1枚ごとのJPEG, pdf/tiff: 全ページを1つのファイルに")
+    parser.add_argument("--type", dest="application_type", choices=["out", "in"], default="out",
+                        help="out: 学外申請書, in: 学内申請書")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="ワーカープロセス数")
+    parser.add_argument("--encoder", choices=list(ENCODERS), default=None,
+                        help=f"出力のエンコード設定（既定: {DEFAULT_ENCODER}）")
+    parser.add_argument("--encoder-report", action="store_true",
+                        help="先頭の1枚で各エンコーダーの時間とサイズを比較して終了する")
+    parser.add_argument("--no-cache", action="store_true", help="描画結果のキャッシュを使わない")
+    parser.add_argument("--slots", nargs="+", default=None,
+                        help="使う面の名前と順番（既定: 位置JSONのすべての面）")
+    parser.add_argument("--partial", choices=PARTIAL_POLICIES, default="blank",
+                        help="最後の1枚が埋まらない場合 blank: 空けておく, repeat: 最後のレコードで埋める, drop: 作成しない")
+    parser.add_argument("--validate-only", action="store_true", help="入力のチェックだけを行う")
+    parser.add_argument("--no-validate", action="store_true", help="描画前の入力チェックを行わない")
+    args = parser.parse_args(argv)
+
+    try:
+        resolve_slots(args.application_type, args.slots)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        records = load_records(args.records)
+    except ValueError as e: # 入力ファイルの形式の誤り
+        parser.error(str(e))
+    if args.encoder_report:
+        if not records:
+            print(f"レコードがないため比較できません: {args.records}")
+            return 1
+        left, right = (records + [None])[:2]
+        print(compare_encoders_for(args.application_type, left.to_drawer_data(),
+                                   right.to_drawer_data() if right is not None else None))
+        return 0
+
+    if not args.no_validate:
+        start = time.perf_counter()
+        report = validate_batch(records, args.application_type, args.slots)
+        print(report.format())
+        print(f"チェック時間: {(time.perf_counter() - start) * 1000:.0f} ms")
+        if report.errors:
+            print("エラーがあるため作成しません（--no-validate でチェックを省略できます）")
+            return 1
+    if args.validate_only:
+        return 0
+
+    cache = None if args.no_cache else default_cache()
+    count, elapsed = render_batch(records, args.output, args.application_type, args.workers,
+                                  args.output_mode, args.encoder, cache, args.slots, args.partial)
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"{count} 枚を作成しました ({elapsed:.2f} 秒, {rate:.1f} 枚/秒): {args.output}")
+    if cache is not None:
+        stats = cache.stats()
+        print(f"キャッシュ: ヒット {stats['hits']} / ミス {stats['misses']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
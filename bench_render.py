@@ -0,0 +1,218 @@
+"""描画処理のベンチマーク（GUIなし）
+
+generate() と同じ処理を段階ごとに分けて計測する。
+    python bench_render.py                          # 計測して表示
+    python bench_render.py --save bench_base.json   # 基準値として保存
+    python bench_render.py --compare bench_base.json --threshold 20
+        # 基準値より20%以上遅くなった段階があれば終了コード1
+
+名簿・プロファイルは 10 / 1,000 / 50,000 人分を合成して計測する。
+"""
+import argparse
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from PIL import Image
+
+import form_data
+from form_data import build_drawer_data, build_form_data
+from layout_plan import compile_layout, supports_plans
+from module.imageFormDrawer.imageFormDrawer import FormDrawer
+from roster import Roster
+from validation import validate_records
+from settings import FONT_PATH, SUBJECT_COUNT, template_paths
+
+ROSTER_SIZES = (10, 1000, 50000)
+SEARCHES = 200
+
+_FAMILY = ["山田", "鈴木", "佐藤", "田中", "高橋", "伊藤", "渡辺", "中村", "小林", "加藤"]
+_GIVEN = ["太郎", "花子", "次郎", "美咲", "翔太", "陽菜", "大輝", "結衣"]
+_SUBJECTS = [("AIマネジメント", "山田"), ("半導体", "田中"), ("クラスワーク", "佐藤"), ("ゲームプログラミング", "東雲")]
+
+
+def synthetic_roster(size, seed=0):
+    rnd = random.Random(seed)
+    return [
+        {
+            "学籍番号": f"{1000000 + i}",
+            "氏名": f"{rnd.choice(_FAMILY)} {rnd.choice(_GIVEN)}",
+            "クラス": f"{rnd.randint(1, 5)}C{rnd.randint(1, 9)}",
+            "出席番号": f"{rnd.randint(1, 40):02d}",
+            "学科": "情報システム学科",
+        }
+        for i in range(size)
+    ]
+
+
+def synthetic_profile(student, rnd):
+    subjects = [{"subject": s, "teacher": t} for s, t in rnd.sample(_SUBJECTS, rnd.randint(1, len(_SUBJECTS)))]
+    return {
+        "name": student["氏名"], "class": student["クラス"], "student_number": student["出席番号"],
+        "department": student["学科"], "gakuseki": student["学籍番号"],
+        "year": "2026", "month": str(rnd.randint(1, 12)), "day": str(rnd.randint(1, 28)),
+        "visit_dest": "株式会社サンプル", "nearest_station": "東京駅", "reason": "就職活動のため",
+        "iki_type": rnd.choice("ab"), "iki_a_h": "8", "iki_a_m": "30", "iki_b_h": "9", "iki_b_m": "00",
+        "kaeri_type": rnd.choice("ab"), "kaeri_a_h": "18", "kaeri_a_m": "00", "kaeri_b_h": "17", "kaeri_b_m": "30",
+        "subjects": subjects + [{"subject": "", "teacher": ""}] * (SUBJECT_COUNT - len(subjects)),
+    }
+
+
+def measure(func, repeat):
+    """func を repeat 回実行し、中央値（秒）を返す"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def _load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def bench_template(application_type, form_data, repeat):
+    """generate() の各段階を、キャッシュを使わずに計測する"""
+    image_pos_path, circ_pos_path, image_path = template_paths(application_type)
+    results = {}
+
+    results["positions_load"] = measure(lambda: (_load_json(image_pos_path), _load_json(circ_pos_path)), repeat)
+    image_pos, circ_pos = _load_json(image_pos_path), _load_json(circ_pos_path)
+
+    def decode():
+        with Image.open(image_path) as img:
+            img.load()
+    results["image_decode"] = measure(decode, repeat)
+
+    def decode_draft(): # プレビュー用の1/4縮小デコード
+        with Image.open(image_path) as img:
+            img.draft(img.mode, (img.width // 4, img.height // 4))
+            img.load()
+    results["image_decode_quarter"] = measure(decode_draft, repeat)
+    results["drawer_init"] = measure(lambda: FormDrawer(FONT_PATH), repeat)
+
+    drawer = FormDrawer(FONT_PATH)
+    base = Image.open(image_path)
+    base.load()
+    for side in ("left", "right"):
+        results[f"draw_{side}"] = measure(
+            lambda: drawer.draw(base.copy(), form_data, image_pos[side], circ_pos[side]), repeat)
+
+    # FormDrawer がコンパイルしたレイアウトプランでの描画（対応していない場合は計測しない）
+    if supports_plans(drawer):
+        results["plan_compile"] = measure(lambda: compile_layout(drawer, image_pos, circ_pos), repeat)
+        plans = compile_layout(drawer, image_pos, circ_pos)
+        for side in ("left", "right"):
+            results[f"draw_plan_{side}"] = measure(
+                lambda: drawer.draw_plan(base.copy(), form_data, plans[side]), repeat)
+
+    img = base.copy()
+    drawer.draw(img, form_data, image_pos["left"], circ_pos["left"])
+    drawer.draw(img, form_data, image_pos["right"], circ_pos["right"])
+    results["save"] = measure(lambda: img.save(io.BytesIO(), "JPEG"), repeat)
+    return results
+
+
+def bench_roster(size, repeat):
+    """名簿の索引作成・検索と、FormRecordの作成・変換・保存と読み込みを計測する"""
+    records = synthetic_roster(size)
+    rnd = random.Random(size)
+    profiles = [synthetic_profile(student, rnd) for student in records]
+    results = {}
+
+    results["roster_index"] = measure(lambda: Roster(records), repeat)
+    roster = Roster(records)
+    queries = [rnd.choice(_FAMILY)[:rnd.randint(1, 2)] for _ in range(SEARCHES)]
+    results["roster_search"] = measure(lambda: [roster.search(q) for q in queries], repeat)
+    results["form_data_build"] = measure(lambda: [build_form_data(p) for p in profiles], repeat)
+    results["record_build"] = measure(lambda: form_data.records_from_profiles(profiles), repeat)
+    form_records = form_data.records_from_profiles(profiles)
+    results["record_drawer_data"] = measure(lambda: build_drawer_data(form_records), repeat)
+    results["record_dump"] = measure(lambda: form_data.dump_records(form_records, io.StringIO()), repeat)
+    buf = io.StringIO()
+    form_data.dump_records(form_records, buf)
+    results["record_load"] = measure(lambda: form_data.load_records(io.StringIO(buf.getvalue())), repeat)
+    results["validate"] = measure(lambda: validate_records(form_records), repeat)
+    return results
+
+
+def run(repeat=5, sizes=ROSTER_SIZES):
+    rnd = random.Random(0)
+    form_data = build_form_data(synthetic_profile(synthetic_roster(1)[0], rnd))
+    stages = {}
+    for application_type in ("out", "in"):
+        for stage, seconds in bench_template(application_type, form_data, repeat).items():
+            stages[f"{application_type}/{stage}"] = seconds
+    for size in sizes:
+        for stage, seconds in bench_roster(size, max(1, repeat if size < 10000 else repeat // 2)).items():
+            stages[f"roster{size}/{stage}"] = seconds
+    return {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "repeat": repeat},
+        "stages": stages,
+    }
+
+
+def compare(baseline, current, threshold, min_delta):
+    """threshold(%) を超えて遅くなった段階を [(段階, 基準, 今回, 増加率), ...] で返す"""
+    regressions = []
+    for stage, base in baseline["stages"].items():
+        now = current["stages"].get(stage)
+        if now is None or base <= 0:
+            continue
+        ratio = (now - base) / base * 100
+        if ratio > threshold and now - base > min_delta:
+            regressions.append((stage, base, now, ratio))
+    return regressions
+
+
+def print_results(results, baseline=None):
+    for stage, seconds in results["stages"].items():
+        line = f"{stage:<36}{seconds * 1000:>10.2f} ms"
+        if baseline and stage in baseline["stages"] and baseline["stages"][stage] > 0:
+            base = baseline["stages"][stage]
+            line += f"  (基準 {base * 1000:.2f} ms, {(seconds - base) / base * 100:+.1f}%)"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="描画処理のベンチマーク")
+    parser.add_argument("--repeat", type=int, default=5, help="各段階の実行回数（中央値を使う）")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(ROSTER_SIZES), help="合成する名簿の人数")
+    parser.add_argument("--save", help="結果を基準値としてJSONに保存する")
+    parser.add_argument("--compare", help="基準値のJSONと比較する")
+    parser.add_argument("--threshold", type=float, default=20.0, help="遅くなったとみなす増加率(%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="この時間(ms)以下の差は誤差として無視する")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, args.sizes)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+        print(f"基準値を保存しました: {args.save}")
+
+    if baseline:
+        regressions = compare(baseline, results, args.threshold, args.min_delta_ms / 1000)
+        if regressions:
+            print(f"\n{args.threshold:.0f}% 以上遅くなった段階があります:")
+            for stage, base, now, ratio in regressions:
+                print(f"  {stage}: {base * 1000:.2f} ms -> {now * 1000:.2f} ms ({ratio:+.1f}%)")
+            return 1
+        print("\n基準値からの劣化はありません")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
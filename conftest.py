@@ -0,0 +1 @@
+# pytest がリポジトリ直下のモジュール（imposition.py など）を import できるようにするためのファイル
@@ -0,0 +1,102 @@
+"""出力画像のエンコード設定
+
+用途に合わせたプリセット（印刷向けの速いJPEG、保存向けの小さいファイル、
+FAX風の白黒など）を名前で選べるようにする。register_encoder() で追加もできる。
+"""
+import io
+import time
+
+
+class Encoder:
+    __slots__ = ("name", "format", "ext", "mode", "options", "description")
+
+    def __init__(self, name, format, ext, mode=None, options=None, description=""):
+        self.name = name
+        self.format = format   # PILの保存形式
+        self.ext = ext
+        self.mode = mode       # 保存前に変換するモード（"L": グレースケール, "1": 白黒）
+        self.options = options or {}
+        self.description = description
+
+    def prepare(self, img):
+        """保存形式に合わせて画像のモードを変換する"""
+        if self.mode == "1":
+            from PIL import Image # GUIの起動時にPILを読み込まないよう、ここで読み込む
+            return img.convert("L").convert("1", dither=Image.Dither.NONE)
+        if self.mode and img.mode != self.mode:
+            return img.convert(self.mode)
+        return img
+
+    def save(self, img, fp):
+        img = self.prepare(img)
+        options = dict(self.options)
+        if "dpi" in img.info:
+            options.setdefault("dpi", img.info["dpi"])
+        img.save(fp, self.format, **options)
+
+    def encode(self, img):
+        buf = io.BytesIO()
+        self.save(img, buf)
+        return buf.getvalue()
+
+
+ENCODERS = {}
+
+
+def register_encoder(encoder):
+    ENCODERS[encoder.name] = encoder
+    return encoder
+
+
+register_encoder(Encoder("jpeg-fast", "JPEG", ".jpg",
+                         options={"quality": 85, "subsampling": 2},
+                         description="印刷向け（速い）"))
+register_encoder(Encoder("jpeg-balanced", "JPEG", ".jpg",
+                         options={"quality": 90, "subsampling": 1},
+                         description="標準"))
+register_encoder(Encoder("jpeg-small", "JPEG", ".jpg",
+                         options={"quality": 75, "subsampling": 2, "optimize": True, "progressive": True},
+                         description="保存向け（小さい）"))
+register_encoder(Encoder("png", "PNG", ".png",
+                         options={"compress_level": 6},
+                         description="可逆圧縮"))
+register_encoder(Encoder("png-fast", "PNG", ".png",
+                         options={"compress_level": 1},
+                         description="可逆圧縮（速い）"))
+register_encoder(Encoder("webp", "WEBP", ".webp",
+                         options={"quality": 80, "method": 4},
+                         description="WebP"))
+register_encoder(Encoder("gray", "PNG", ".png", mode="L",
+                         options={"compress_level": 6},
+                         description="グレースケール"))
+register_encoder(Encoder("fax", "TIFF", ".tif", mode="1",
+                         options={"compression": "group4"},
+                         description="白黒（FAX形式）"))
+
+DEFAULT_ENCODER = "jpeg-balanced"
+
+
+def get_encoder(name=None):
+    """名前からエンコーダーを返す（Noneなら標準）"""
+    try:
+        return ENCODERS[name or DEFAULT_ENCODER]
+    except KeyError:
+        raise ValueError(f"不明なエンコーダーです: {name}（{', '.join(ENCODERS)}）") from None
+
+
+def compare_encoders(img, names=None):
+    """各エンコーダーで img をエンコードし、[(名前, 秒数, バイト数), ...] を返す"""
+    results = []
+    for name in names or ENCODERS:
+        encoder = get_encoder(name)
+        start = time.perf_counter()
+        size = len(encoder.encode(img))
+        results.append((name, time.perf_counter() - start, size))
+    return results
+
+
+def format_report(results):
+    lines = [f"{'エンコーダー':<14}{'時間(ms)':>10}{'サイズ(KB)':>12}"]
+    for name, seconds, size in results:
+        lines.append(f"{name:<16}{seconds * 1000:>10.1f}{size / 1024:>12.1f}")
+    return "\n".join(lines)
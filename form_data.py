@@ -0,0 +1,285 @@
+"""フォームの入力値のモデルと、FormDrawer用の辞書への変換（PILやTkに依存しない）
+
+FormRecord は片側1枚分の入力値を持つ。プロファイルのJSON・FormDrawer用の辞書・
+一括保存用の行形式（フィールド順のリスト）との相互変換をここにまとめ、
+GUI・一括作成・ベンチマークで同じフィールドの定義を使う。
+"""
+import contextlib
+import functools
+import gc
+import json
+import sys
+from datetime import datetime
+
+from settings import SUBJECT_COUNT
+
+# プロファイルのキー（科目以外）。GUIのStringVarも同じ名前
+PROFILE_KEYS = (
+    "name", "class", "student_number", "department", "gakuseki",
+    "year", "month", "day", "visit_dest", "nearest_station", "reason",
+    "iki_type", "iki_a_h", "iki_a_m", "iki_b_h", "iki_b_m",
+    "kaeri_type", "kaeri_a_h", "kaeri_a_m", "kaeri_b_h", "kaeri_b_m",
+)
+# 属性名（"class" は予約語なので class_ にする）
+_ATTRS = tuple("class_" if key == "class" else key for key in PROFILE_KEYS)
+_DEFAULTS = {"iki_type": "b", "kaeri_type": "b"}
+# 同じ値が多いフィールドは sys.intern() して、大量のレコードで文字列を共有する
+_INTERNED = frozenset(("class", "department", "year", "month", "day", "visit_dest", "nearest_station",
+                       "iki_type", "iki_a_h", "iki_a_m", "iki_b_h", "iki_b_m",
+                       "kaeri_type", "kaeri_a_h", "kaeri_a_m", "kaeri_b_h", "kaeri_b_m"))
+_INTERN_INDEX = tuple(i for i, key in enumerate(PROFILE_KEYS) if key in _INTERNED)
+
+# FormDrawer用の辞書のキー（往復の時間は区分によって切り替える）
+_DRAWER_KEYS = (
+    ("氏名", "name"), ("学籍番号", "gakuseki"), ("クラス", "class_"), ("出席番号", "student_number"),
+    ("学科", "department"), ("訪問日_年", "year"), ("訪問日_月", "month"), ("訪問日_日", "day"),
+    ("訪問先", "visit_dest"), ("最寄り駅", "nearest_station"), ("内容", "reason"),
+)
+_SUBJECT_KEYS = tuple((f"科目{i}_科目名", f"科目{i}_担当教員") for i in range(1, SUBJECT_COUNT + 1))
+
+RECORDS_FORMAT = "form-records"
+RECORDS_VERSION = 1
+_WEEKDAYS = "月火水木金土日"
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _text(key, value):
+    """JSONLなどから読んだ値を文字列にそろえる（nullは未入力として扱う）"""
+    if value is None:
+        return _DEFAULTS.get(key, "")
+    return value if type(value) is str else str(value)
+
+
+class SubjectEntry:
+    """科目名と担当教員の組（作成後は変更しない。同じ組は subject_entry() で共有する）"""
+    __slots__ = ("subject", "teacher")
+
+    def __init__(self, subject="", teacher=""):
+        self.subject = subject
+        self.teacher = teacher
+
+    def __eq__(self, other):
+        return isinstance(other, SubjectEntry) and (self.subject, self.teacher) == (other.subject, other.teacher)
+
+    def __repr__(self):
+        return f"SubjectEntry({self.subject!r}, {self.teacher!r})"
+
+
+_EMPTY_SUBJECT = SubjectEntry()
+_subject_entries = {("", ""): _EMPTY_SUBJECT}
+_SUBJECT_ENTRIES_MAX = 10000
+
+
+def subject_entry(subject="", teacher=""):
+    """同じ科目名・担当教員の組には同じ SubjectEntry を返す"""
+    key = (subject, teacher)
+    entry = _subject_entries.get(key)
+    if entry is None:
+        entry = SubjectEntry(_intern(subject), _intern(teacher))
+        if len(_subject_entries) < _SUBJECT_ENTRIES_MAX:
+            _subject_entries[key] = entry
+    return entry
+
+
+class FormRecord:
+    """片側1枚分のフォームの入力値"""
+    __slots__ = _ATTRS + ("subjects",)
+
+    def __init__(self, name="", class_="", student_number="", department="", gakuseki="",
+                 year="", month="", day="", visit_dest="", nearest_station="", reason="",
+                 iki_type="b", iki_a_h="", iki_a_m="", iki_b_h="", iki_b_m="",
+                 kaeri_type="b", kaeri_a_h="", kaeri_a_m="", kaeri_b_h="", kaeri_b_m="",
+                 subjects=()):
+        # 引数の順はPROFILE_KEYSと同じ
+        self.name = name
+        self.class_ = class_
+        self.student_number = student_number
+        self.department = department
+        self.gakuseki = gakuseki
+        self.year = year
+        self.month = month
+        self.day = day
+        self.visit_dest = visit_dest
+        self.nearest_station = nearest_station
+        self.reason = reason
+        self.iki_type = iki_type
+        self.iki_a_h = iki_a_h
+        self.iki_a_m = iki_a_m
+        self.iki_b_h = iki_b_h
+        self.iki_b_m = iki_b_m
+        self.kaeri_type = kaeri_type
+        self.kaeri_a_h = kaeri_a_h
+        self.kaeri_a_m = kaeri_a_m
+        self.kaeri_b_h = kaeri_b_h
+        self.kaeri_b_m = kaeri_b_m
+        self.subjects = tuple(subjects)
+
+    # --- プロファイル（JSON）との変換 ---
+
+    @classmethod
+    def from_profile(cls, data):
+        """プロファイルと同じ形式の辞書から作る"""
+        get = data.get
+        values = [get(key, _DEFAULTS.get(key, "")) for key in PROFILE_KEYS]
+        if not all(type(value) is str for value in values):
+            values = [_text(key, value) for key, value in zip(PROFILE_KEYS, values)]
+        for i in _INTERN_INDEX:
+            values[i] = _intern(values[i])
+        subjects = [
+            subject_entry(_text("subject", sub.get("subject")), _text("teacher", sub.get("teacher")))
+            for sub in list(get("subjects") or ())[:SUBJECT_COUNT]
+        ]
+        return cls(*values, subjects=subjects)
+
+    def to_profile(self):
+        """プロファイルと同じ形式の辞書にする（科目は常にSUBJECT_COUNT件）"""
+        data = {key: getattr(self, attr) for key, attr in zip(PROFILE_KEYS, _ATTRS)}
+        data["subjects"] = [{"subject": s.subject, "teacher": s.teacher} for s in self.padded_subjects()]
+        return data
+
+    def padded_subjects(self):
+        subjects = self.subjects[:SUBJECT_COUNT]
+        return subjects + (_EMPTY_SUBJECT,) * (SUBJECT_COUNT - len(subjects))
+
+    # --- FormDrawer用の辞書 ---
+
+    def weekday(self):
+        return weekday_of(self.year, self.month, self.day)
+
+    def to_drawer_data(self, weekday=None):
+        """FormDrawer用の辞書を作る。weekday を渡すと曜日の計算を省く"""
+        data = {key: getattr(self, attr) for key, attr in _DRAWER_KEYS}
+        data["訪問日_曜日"] = self.weekday() if weekday is None else weekday
+
+        for (subject_key, teacher_key), sub in zip(_SUBJECT_KEYS, self.padded_subjects()):
+            data[subject_key] = sub.subject
+            data[teacher_key] = sub.teacher
+
+        data["行き_区分"] = self.iki_type
+        data["帰り_区分"] = self.kaeri_type
+
+        if self.iki_type == 'a':
+            data["行きa_時間"] = self.iki_a_h
+            data["行きa_分"] = self.iki_a_m
+        else:
+            data["行きb_時間"] = self.iki_b_h
+            data["行きb_分"] = self.iki_b_m
+
+        if self.kaeri_type == 'a':
+            data["帰りa_時間"] = self.kaeri_a_h
+            data["帰りa_分"] = self.kaeri_a_m
+        else:
+            data["帰りb_時間"] = self.kaeri_b_h
+            data["帰りb_分"] = self.kaeri_b_m
+
+        return data
+
+    # --- 一括保存用の行形式 ---
+
+    def to_row(self):
+        """PROFILE_KEYSの順の値の後に、科目名・担当教員を交互に並べたリストにする"""
+        row = [getattr(self, attr) for attr in _ATTRS]
+        for sub in self.padded_subjects():
+            row.append(sub.subject)
+            row.append(sub.teacher)
+        return row
+
+    @classmethod
+    def from_row(cls, row):
+        n = len(PROFILE_KEYS)
+        values = list(row[:n])
+        for i in _INTERN_INDEX:
+            values[i] = _intern(values[i])
+        rest = row[n:]
+        subjects = [subject_entry(rest[i], rest[i + 1]) for i in range(0, len(rest) - 1, 2)]
+        return cls(*values, subjects=subjects)
+
+    def __eq__(self, other):
+        return isinstance(other, FormRecord) and self.to_row() == other.to_row()
+
+    def __repr__(self):
+        return f"FormRecord(name={self.name!r}, gakuseki={self.gakuseki!r})"
+
+
+@functools.lru_cache(maxsize=4096)
+def weekday_of(year, month, day):
+    """日付の曜日（"月"〜"日"）を返す。日付として正しくなければ空文字"""
+    try:
+        return _WEEKDAYS[datetime(int(year), int(month), int(day)).weekday()]
+    except (ValueError, TypeError):
+        return ""
+
+
+def weekdays(records):
+    """レコードの曜日をまとめて求める（同じ日付は1回だけ計算する）"""
+    seen = {}
+    result = []
+    for record in records:
+        date = (record.year, record.month, record.day)
+        weekday = seen.get(date)
+        if weekday is None:
+            weekday = seen[date] = weekday_of(*date)
+        result.append(weekday)
+    return result
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    """大量のレコードを作る間、循環参照のGCを止める（作るだけなので回収するものがない）"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def records_from_profiles(profiles):
+    """プロファイル形式の辞書のリストからFormRecordのリストを作る"""
+    with _gc_paused():
+        return [FormRecord.from_profile(profile) for profile in profiles]
+
+
+def build_drawer_data(records):
+    """複数のレコードからFormDrawer用の辞書のリストを作る"""
+    return [record.to_drawer_data(weekday) for record, weekday in zip(records, weekdays(records))]
+
+
+def build_form_data(values):
+    """フォームの入力値（プロファイルと同じ形式の辞書）から、FormDrawer用の辞書を作成する"""
+    return FormRecord.from_profile(values).to_drawer_data()
+
+
+def dump_records(records, fp):
+    """レコードを1行1件の行形式（JSONの配列）で書き込む。先頭行はフィールドの定義"""
+    header = {"format": RECORDS_FORMAT, "version": RECORDS_VERSION,
+              "fields": list(PROFILE_KEYS), "subjects": SUBJECT_COUNT}
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    fp.write(encode(header) + "\n")
+    fp.writelines(encode(record.to_row()) + "\n" for record in records)
+
+
+def load_records(fp):
+    """dump_records() で書き込んだレコードを読み込む"""
+    header = json.loads(fp.readline() or "{}")
+    if header.get("format") != RECORDS_FORMAT or header.get("version") != RECORDS_VERSION:
+        raise ValueError("レコードファイルの形式が正しくありません")
+    # 1行ずつではなく、全行を1つの配列としてまとめてデコードする
+    with _gc_paused():
+        rows = json.loads("[" + ",".join(line for line in fp.read().splitlines() if line.strip()) + "]")
+        if header.get("fields") == list(PROFILE_KEYS):
+            return [FormRecord.from_row(row) for row in rows]
+
+    # フィールドの並びが違うファイルは、名前で対応付けて読む
+    fields = header["fields"]
+    records = []
+    for row in rows:
+        data = dict(zip(fields, row))
+        rest = row[len(fields):]
+        data["subjects"] = [{"subject": rest[i], "teacher": rest[i + 1]} for i in range(0, len(rest) - 1, 2)]
+        records.append(FormRecord.from_profile(data))
+    return records
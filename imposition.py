@@ -0,0 +1,60 @@
+"""面付け（1枚の用紙に複数のフォームを割り当てる）
+
+位置JSONの最上位のキー（"left", "right" など）を面（スロット）として読み、
+レコードの並びを先頭から面の順に詰めて1枚ずつ返す。面が2つなら300件は150枚になる。
+最後の1枚が埋まらない場合の扱いは PARTIAL_POLICIES から選ぶ。
+"""
+import json
+
+from settings import template_paths
+
+# 最後の1枚が埋まらない場合の扱い
+#   blank:  空いた面は描画しない
+#   repeat: 空いた面を最後のレコードで埋める
+#   drop:   埋まらない1枚は作成しない
+PARTIAL_POLICIES = ("blank", "repeat", "drop")
+
+
+def read_slots(application_type):
+    """位置JSONに定義された面の名前を、ファイル内の順に返す"""
+    image_pos_path = template_paths(application_type)[0]
+    with open(image_pos_path, "r", encoding="utf-8") as f:
+        return tuple(json.load(f))
+
+
+def check_slots(slots):
+    """面の並びが空でなく、同じ面を2回以上含まないことを確認する"""
+    if not slots:
+        raise ValueError("面が1つもありません")
+    duplicated = sorted({slot for slot in slots if list(slots).count(slot) > 1})
+    if duplicated:
+        raise ValueError(f"同じ面が2回以上指定されています: {', '.join(duplicated)}")
+
+
+def impose(records, slots, partial="blank"):
+    """レコードを面に詰め、1枚ごとに {面の名前: レコード} を返すジェネレーター
+
+    records はイテレーターでもよく、1枚分ずつ読み進める。
+    """
+    if partial not in PARTIAL_POLICIES:
+        raise ValueError(f"不明な指定です: {partial}（{', '.join(PARTIAL_POLICIES)}）")
+    check_slots(slots)
+    sheet = {}
+    for record in records:
+        sheet[slots[len(sheet)]] = record
+        if len(sheet) == len(slots):
+            yield sheet
+            sheet = {}
+    if not sheet or partial == "drop":
+        return
+    if partial == "repeat":
+        last = sheet[slots[len(sheet) - 1]]
+        for slot in slots[len(sheet):]:
+            sheet[slot] = last
+    yield sheet
+
+
+def sheet_count(record_count, slots, partial="blank"):
+    """レコード数から作成する枚数を返す"""
+    full, rest = divmod(record_count, len(slots))
+    return full + (1 if rest and partial != "drop" else 0)
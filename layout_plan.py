@@ -0,0 +1,42 @@
+"""レイアウトプラン（FormDrawer が位置JSON・丸印JSONを事前に解釈したもの）
+
+FormDrawer.draw() は描画のたびに位置の辞書を引き直し、フォントを用意し、文字の幅を
+測っている。FormDrawer が次のメソッドを持つ場合は、片側ごとに一度だけプランに
+変換（コンパイル）しておき、描画ではそのプランを FormDrawer に実行させる。
+    compile_plan(image_pos, circ_pos)  片側の位置JSON・丸印JSONからプランを作る
+    draw_plan(img, data, plan)         プランに従って描画する（draw() と同じ結果になること）
+    text_fits(plan, key, text)         （任意）文字列が枠に収まるか。入力チェックで使う
+位置JSONの解釈、フォントの用意、文字の大きさの計測（とそのキャッシュ）はすべて
+FormDrawer が行い、ここでは独自の規則を持たない。FormDrawer が対応していなければ
+今までどおり draw() で描画する。
+プランはテンプレートと一緒にプロセス内にキャッシュし（template_cache）、
+位置JSONが変わったら作り直す。
+"""
+
+PLAN_VERSION = 2 # このモジュールとFormDrawerの間の取り決めの版（描画結果のキャッシュのキーに使う）
+
+
+def supports_plans(drawer):
+    """FormDrawer がレイアウトプランのコンパイルと描画に対応しているか"""
+    return callable(getattr(drawer, "compile_plan", None)) and callable(getattr(drawer, "draw_plan", None))
+
+
+def supports_text_fits(drawer):
+    """FormDrawer が文字列が枠に収まるかの確認に対応しているか"""
+    return supports_plans(drawer) and callable(getattr(drawer, "text_fits", None))
+
+
+def compile_layout(drawer, image_pos, circ_pos):
+    """位置JSON・丸印JSON全体から {側: プラン} を作る。FormDrawer が対応していなければ None"""
+    if not supports_plans(drawer):
+        return None
+    return {side: drawer.compile_plan(image_pos[side], circ_pos[side]) for side in image_pos}
+
+
+def draw_side(drawer, img, form_data, image_pos, circ_pos, side, plans=None):
+    """片側を描画する（その側のプランがあれば draw_plan()、なければ draw()）"""
+    plan = plans.get(side) if plans else None
+    if plan is not None:
+        drawer.draw_plan(img, form_data, plan)
+    else:
+        drawer.draw(img, form_data, image_pos[side], circ_pos[side])
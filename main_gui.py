@@ -1,40 +1,85 @@
+import time
+_START = time.perf_counter() # 起動時間の計測用（他のimportより先に記録する）
+
 import tkinter as tk
-from tkinter import ttk, messagebox
-import json
-from PIL import Image
+from tkinter import ttk, messagebox, filedialog
+import bisect
 import os
 from datetime import datetime
 
-# 前回作成したモジュールをインポート
-from module.imageFormDrawer.imageFormDrawer import FormDrawer
+# PILとFormDrawerを使うモジュールは、最初の描画のときにワーカースレッドで読み込む
+import timing
+from profile_store import ProfileStore
+from reference_data import ReferenceData
+from encoders import DEFAULT_ENCODER, ENCODERS
+from form_data import PROFILE_KEYS, FormRecord, subject_entry
+from render_cache import default_cache
+from render_worker import RenderWorker
+from settings import OUTPUT_PATH, DATA_DIR, IMAGE_DIR, PROFILE_DIR, PROFILE_DB, RENDER_SERVICE_URL
+
+# 入力が止まってからプレビューを更新するまでの時間(ms)
+PREVIEW_DELAY_MS = 300
+# プロファイルのコンボボックスに表示する最大件数
+PROFILE_LIST_LIMIT = 200
+# 氏名のコンボボックスに表示する最大件数
+STUDENT_LIST_LIMIT = 50
+# 科目・名簿・レイアウトのファイルの更新を確認する間隔(ms)
+REFERENCE_POLL_MS = 2000
+# 名簿から自動入力する項目 -> 名簿の列
+STUDENT_FIELDS = {"class": "クラス", "student_number": "出席番号", "department": "学科", "gakuseki": "学籍番号"}
+# エンコーダー以外に選べる出力形式 -> 拡張子
+DOCUMENT_FORMATS = {"PDF": ".pdf", "TIFF": ".tif"}
+
+# 環境変数 FORM_TOOL_STARTUP=1 で、起動にかかった時間を表示する
+STARTUP_TRACE = os.environ.get("FORM_TOOL_STARTUP") == "1"
+# 起動時間の目標(ms): ウィンドウの表示まで / データとテンプレートの読み込み完了まで
+STARTUP_BUDGET_MS = {"first_window": 500, "ready": 3000}
+
+
+def report_startup(stage):
+    if STARTUP_TRACE:
+        elapsed = (time.perf_counter() - _START) * 1000
+        budget = STARTUP_BUDGET_MS[stage]
+        result = "OK" if elapsed <= budget else "超過"
+        print(f"[startup] {stage}: {elapsed:.0f}ms (目標 {budget}ms, {result})", flush=True)
+
+
+# 以下はワーカースレッドで実行する（PILなどはここで初めて読み込まれる）
+def _warm_templates():
+    import template_cache
+    template_cache.warm()
+
+
+def _render_to_file(*args):
+    if RENDER_SERVICE_URL:
+        from render_client import RenderClient, RenderServiceBusy
+        try:
+            return RenderClient(RENDER_SERVICE_URL).render_to_file(*args)
+        except (RenderServiceBusy, OSError): # サーバーに繋がらない・混雑している場合はこのPCで描画する
+            pass
+    from render_core import render_to_file
+    return render_to_file(*args)
+
+
+def _compare_encoders_for(*args):
+    from render_core import compare_encoders_for
+    return compare_encoders_for(*args)
 
-# --- 設定 ---
-OUTPUT_PATH = "作成済.jpg"
-FONT_PATH = "./module/imageFormDrawer/fonts/ipaexg.ttf"
 
-# 設定ファイルのパス
-DATA_DIR = "data"
-IMAGE_DIR = os.path.join(DATA_DIR, "image")
-IMAGE_PATH_OUT = os.path.join(IMAGE_DIR, "A4_out.jpg")
-IMAGE_PATH_IN = os.path.join(IMAGE_DIR, "A4_in.jpg")
-IMAGE_POSITIONS_OUT = "./module/imageFormDrawer/json/image_positions-out.json"
-CIRC_POSITIONS_OUT = "./module/imageFormDrawer/json/circles_positions-out.json"
-IMAGE_POSITIONS_IN = "./module/imageFormDrawer/json/image_positions-in.json"
-CIRC_POSITIONS_IN = "./module/imageFormDrawer/json/circles_positions-in.json"
-SUBJECT_JSON = os.path.join(DATA_DIR, "subject.json")
-STUDENT_JSON = os.path.join(DATA_DIR, "student_data.json")
-PROFILE_DIR = "profile"
+def _name_key(name):
+    """氏名の比較用に空白を取り除く"""
+    return "".join(name.split())
 
 
 class Application(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("公欠届作成ツール")
-        self.geometry("1100x750")
+        self.geometry("1600x750")
 
-        # データの読み込み
-        self.subjects = self.load_json(SUBJECT_JSON)
-        self.students = self.load_json(STUDENT_JSON)
+        # 科目・名簿はウィンドウの表示後にバックグラウンドで読み込む
+        self.reference = ReferenceData()
+        self.startup_pending = {"reference", "templates"}
 
         # 左右のフォームのデータを保持する辞書
         self.form_vars = {"left": {}, "right": {}}
@@ -44,6 +89,13 @@ class Application(tk.Tk):
             if not os.path.exists(dir_path):
                 os.makedirs(dir_path)
 
+        # プロファイルの読み込み（初回は既存の profile/*.json を取り込む）
+        self.profile_store = ProfileStore(PROFILE_DB)
+        _, self.profile_import_errors = self.profile_store.migrate_json_dir(PROFILE_DIR) # ウィンドウの表示後に知らせる
+        self.profile_names = self.profile_store.names() # 名前順
+        # 描画はバックグラウンドのワーカーで行う
+        self.render_worker = RenderWorker(self)
+
         # UIの構築
         self.create_widgets()
 
@@ -58,13 +110,122 @@ class Application(tk.Tk):
         # 学内申請書ボタン
         btn_in = ttk.Button(button_frame, text="学内申請書を作成", command=lambda: self.generate("in"))
         btn_in.pack(side="left", expand=True, fill="x", padx=5)
-    def load_json(self, path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            messagebox.showwarning("警告", f"{path} が見つかりません。")
-            return []
+
+        self.generate_buttons = [btn_out, btn_in]
+
+        # 出力形式
+        ttk.Label(button_frame, text="出力形式:").pack(side="left", padx=(10, 0))
+        self.output_format = tk.StringVar(value=DEFAULT_ENCODER)
+        ttk.Combobox(button_frame, textvariable=self.output_format, values=list(ENCODERS) + list(DOCUMENT_FORMATS),
+                     state="readonly", width=14).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="エンコード比較", command=self.show_encoder_report).pack(side="left", padx=5)
+
+        # 作成中の進捗表示
+        self.progress = ttk.Progressbar(button_frame, mode="indeterminate", length=120)
+        self.progress.pack(side="left", padx=5)
+
+        # 描画結果のキャッシュの状況
+        self.cache_label = ttk.Label(button_frame, text="")
+        self.cache_label.pack(side="left", padx=5)
+
+        # 計測が有効なときは、前回の作成にかかった時間の内訳を表示する
+        if timing.is_enabled():
+            status_frame = ttk.Frame(self)
+            status_frame.pack(fill="x", side="bottom", padx=10, pady=(0, 5))
+            self.timing_label = ttk.Label(status_frame, text="", anchor="w")
+            self.timing_label.pack(side="left", fill="x", expand=True)
+            ttk.Button(status_frame, text="トレース出力", command=self.export_trace).pack(side="right")
+
+        # after(0) はTkの最初の描画より先に実行されるため、最初の Expose（描画）を待つ
+        self._first_expose = self.bind("<Expose>", self.on_first_expose, add="+")
+
+    def on_first_expose(self, event):
+        if self._first_expose is None:
+            return
+        self.unbind("<Expose>", self._first_expose)
+        self._first_expose = None
+        # 残りのウィジェットの描画（アイドル処理）が終わってから始める
+        self.after_idle(self.on_first_window)
+
+    def on_first_window(self):
+        """ウィンドウの表示後に、データの読み込みとテンプレートの準備を始める"""
+        report_startup("first_window")
+        self.render_worker.submit(
+            "reference", self.reference.poll,
+            on_done=self.on_reference_loaded, on_error=self.on_reference_load_error,
+        )
+        self.render_worker.submit(
+            "warm", _warm_templates,
+            on_done=lambda result: self.startup_step_done("templates"),
+            on_error=lambda error: self.startup_step_done("templates"), # エラーはプレビューに表示される
+        )
+        if self.profile_import_errors:
+            self.show_profile_import_errors(self.profile_import_errors)
+
+    def startup_step_done(self, step):
+        self.startup_pending.discard(step)
+        if not self.startup_pending:
+            report_startup("ready")
+
+    def on_reference_loaded(self, result):
+        self.apply_reference_changes(*result)
+        self.startup_step_done("reference")
+        self.after(REFERENCE_POLL_MS, self.poll_reference_data)
+
+    def on_reference_load_error(self, error):
+        messagebox.showwarning("警告", f"データの読み込みに失敗しました:\n{error}")
+        self.startup_step_done("reference")
+        self.after(REFERENCE_POLL_MS, self.poll_reference_data)
+
+    def show_profile_import_errors(self, errors):
+        lines = "\n".join(f"{path}: {e}" for path, e in errors)
+        messagebox.showwarning("警告", f"読み込めなかったプロファイルがあります（他のプロファイルは取り込みました）:\n{lines}")
+
+    def show_reference_errors(self, errors):
+        for path, e in errors:
+            if isinstance(e, FileNotFoundError):
+                messagebox.showwarning("警告", f"{path} が見つかりません。")
+            else:
+                messagebox.showwarning("警告", f"{path} の読み込みに失敗しました:\n{e}")
+
+    def poll_reference_data(self):
+        """参照データのファイルが更新されていたら、ワーカーで読み直してから関係する部分だけ更新する
+
+        更新日時の確認（os.stat）もワーカーで行う（ネットワークドライブでは時間がかかることがある）。
+        メインスレッドでは次の確認の予約だけを行う。
+        """
+        self.render_worker.submit(
+            "reference", self.reference.poll,
+            on_done=self.on_reference_reloaded, on_error=self.on_reference_reload_error,
+        )
+
+    def on_reference_reloaded(self, result):
+        self.after(REFERENCE_POLL_MS, self.poll_reference_data) # 反映中に例外が出ても監視は続ける
+        self.apply_reference_changes(*result)
+
+    def on_reference_reload_error(self, error):
+        self.after(REFERENCE_POLL_MS, self.poll_reference_data)
+        messagebox.showwarning("警告", f"データの読み込みに失敗しました:\n{error}")
+
+    def apply_reference_changes(self, changed, errors):
+        self.show_reference_errors(errors)
+        if "subjects" in changed:
+            self.refresh_subject_lists()
+        if "roster" in changed:
+            for side in ("left", "right"):
+                self.update_student_list(side)
+        if "layout" in changed:
+            self.refresh_preview()
+
+    def refresh_subject_lists(self):
+        """科目と教員のコンボボックスの候補を更新する（選択中の値はできるだけ残す）"""
+        for side in ("left", "right"):
+            for subject_info in self.form_vars[side]["subjects"]:
+                subject_info["subject_cb"].config(values=self.reference.subject_names)
+                teachers = self.reference.teachers.get(subject_info["subject"].get(), [])
+                subject_info["teacher_cb"].config(values=teachers)
+                if subject_info["teacher_var"].get() not in teachers:
+                    subject_info["teacher_var"].set(teachers[0] if teachers else "")
 
     def create_widgets(self):
         # --- プロファイル管理フレーム ---
@@ -89,6 +250,7 @@ class Application(tk.Tk):
         self.form_vars[side]["profile_name"] = tk.StringVar()
         self.form_vars[side]["profile_cb"] = ttk.Combobox(parent, textvariable=self.form_vars[side]["profile_name"])
         self.form_vars[side]["profile_cb"].grid(row=0, column=start_column + 1, sticky="ew")
+        self.form_vars[side]["profile_cb"].bind("<KeyRelease>", lambda event: self.update_profile_list(side))
         ttk.Button(parent, text="読み込み", command=lambda: self.load_profile(side)).grid(row=0, column=start_column + 2, padx=5)
         ttk.Button(parent, text="保存", command=lambda: self.save_profile(side)).grid(row=1, column=start_column + 2, padx=5)
         self.update_profile_list(side)
@@ -108,6 +270,42 @@ class Application(tk.Tk):
         main_pane.add(frame_right, weight=1)
         self.create_form_panel(frame_right, "right")
 
+        # プレビューのフレーム
+        frame_preview = ttk.Frame(main_pane)
+        main_pane.add(frame_preview, weight=1)
+        self.create_preview_panel(frame_preview)
+
+        for side in ("left", "right"):
+            self.watch_form_vars(side)
+            self.schedule_preview(side)
+
+    def create_preview_panel(self, parent):
+        """入力内容を縮小表示するプレビューを作成する"""
+        ttk.Label(parent, text="プレビュー", font=("", 12, "bold")).pack(padx=10, pady=5)
+
+        self.preview_type = tk.StringVar(value="out")
+        frame_type = ttk.Frame(parent)
+        frame_type.pack()
+        ttk.Radiobutton(frame_type, text="学外申請書", variable=self.preview_type, value="out").pack(side="left", padx=5)
+        ttk.Radiobutton(frame_type, text="学内申請書", variable=self.preview_type, value="in").pack(side="left", padx=5)
+
+        self.preview_label = ttk.Label(parent, anchor="center")
+        self.preview_label.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        self.preview = None # 最初のプレビューのときにワーカースレッドで作る
+        self.preview_image = None # PhotoImageへの参照を保持しておく
+        self.preview_after = {}   # side -> after()のID
+        self.preview_type.trace_add("write", lambda *args: self.refresh_preview())
+
+    def watch_form_vars(self, side):
+        """片側の入力値が変わったら、その側のプレビューを更新するようにする"""
+        vars = self.form_vars[side]
+        watched = [v for k, v in vars.items() if isinstance(v, tk.StringVar) and k != "profile_name"]
+        for s in vars["subjects"]:
+            watched += [s["subject"], s["teacher_var"]]
+        for var in watched:
+            var.trace_add("write", lambda *args, s=side: self.schedule_preview(s))
+
     def create_form_panel(self, parent, side):
         """指定された親ウィジェットに、片側分の入力フォームを作成する"""
         pad_opt = {"padx": 10, "pady": 5}
@@ -122,10 +320,14 @@ class Application(tk.Tk):
 
         ttk.Label(frame_student, text="氏名:").grid(row=0, column=0, sticky="e")
         self.form_vars[side]["name"] = tk.StringVar()
-        cb_name = ttk.Combobox(frame_student, textvariable=self.form_vars[side]["name"], state="readonly")
-        cb_name["values"] = [d["氏名"] for d in self.students]
+        cb_name = ttk.Combobox(frame_student, textvariable=self.form_vars[side]["name"])
         cb_name.bind("<<ComboboxSelected>>", lambda event, s=side: self.on_student_select(event, s))
+        cb_name.bind("<KeyRelease>", lambda event, s=side: self.on_student_typed(event, s))
+        cb_name.bind("<FocusOut>", lambda event, s=side: self.on_student_focus_out(event, s))
+        self.form_vars[side]["student_name"] = "" # クラスなどを設定した学生の氏名（未選択なら空）
         cb_name.grid(row=0, column=1, sticky="ew", padx=5)
+        self.form_vars[side]["name_cb"] = cb_name
+        self.update_student_list(side)
 
         ttk.Label(frame_student, text="クラス:").grid(row=1, column=0, sticky="e")
         self.form_vars[side]["class"] = tk.StringVar()
@@ -175,7 +377,7 @@ class Application(tk.Tk):
         frame_subject.pack(fill="x", padx=20, pady=5)
 
         self.form_vars[side]["subjects"] = []
-        subject_names = [d["name"] for d in self.subjects]
+        subject_names = self.reference.subject_names
 
         for i in range(6):
             row = i
@@ -192,7 +394,7 @@ class Application(tk.Tk):
             cb_teacher.grid(row=row, column=3, sticky="ew", padx=5, pady=2)
 
             cb_sub.bind("<<ComboboxSelected>>", lambda event, s=side, idx=i: self.on_subject_select(event, s, idx))
-            self.form_vars[side]["subjects"].append({"subject": var_sub, "teacher_var": var_teacher, "teacher_cb": cb_teacher})
+            self.form_vars[side]["subjects"].append({"subject": var_sub, "subject_cb": cb_sub, "teacher_var": var_teacher, "teacher_cb": cb_teacher})
 
         frame_subject.columnconfigure(1, weight=1) # 科目コンボボックスの伸縮
         frame_subject.columnconfigure(3, weight=1) # 教員コンボボックスの伸縮
@@ -249,74 +451,53 @@ class Application(tk.Tk):
 
         frame_detail.columnconfigure(1, weight=1)
 
+    def match_profiles(self, prefix):
+        """名前が prefix で始まるプロファイルを最大 PROFILE_LIST_LIMIT 件返す"""
+        start = bisect.bisect_left(self.profile_names, prefix)
+        end = bisect.bisect_left(self.profile_names, prefix + "\U0010ffff", start)
+        return self.profile_names[start:min(end, start + PROFILE_LIST_LIMIT)]
+
     def update_profile_list(self, side=None):
-        """プロファイルリストを更新する"""
-        try:
-            profiles = [f.replace(".json", "") for f in os.listdir(PROFILE_DIR) if f.endswith(".json")]
-            if side:
-                self.form_vars[side]["profile_cb"]["values"] = profiles
-            else: # 両方更新
-                self.form_vars["left"]["profile_cb"]["values"] = profiles
-                self.form_vars["right"]["profile_cb"]["values"] = profiles
-        except Exception as e:
-            messagebox.showwarning("警告", f"プロファイルリストの読み込みに失敗しました:\n{e}")
+        """プロファイルリストを、入力中の名前で前方一致検索して更新する"""
+        for s in [side] if side else ["left", "right"]: # 指定がなければ両方更新
+            prefix = self.form_vars[s]["profile_name"].get()
+            self.form_vars[s]["profile_cb"]["values"] = self.match_profiles(prefix)
 
     def save_profile(self, side):
-        """フォームの現在の内容をJSONプロファイルとして保存する"""
+        """フォームの現在の内容をプロファイルとして保存する"""
         profile_name = self.form_vars[side]["profile_name"].get()
         if not profile_name:
             messagebox.showerror("エラー", "プロファイル名を入力してください。")
             return
 
-        vars = self.form_vars[side]
-        profile_data = {
-            "name": vars["name"].get(),
-            "class": vars["class"].get(),
-            "student_number": vars["student_number"].get(),
-            "department": vars["department"].get(),
-            "gakuseki": vars["gakuseki"].get(),
-            "year": vars["year"].get(),
-            "month": vars["month"].get(),
-            "day": vars["day"].get(),
-            "visit_dest": vars["visit_dest"].get(),
-            "nearest_station": vars["nearest_station"].get(),
-            "reason": vars["reason"].get(),
-            "iki_type": vars["iki_type"].get(),
-            "iki_a_h": vars["iki_a_h"].get(), "iki_a_m": vars["iki_a_m"].get(),
-            "iki_b_h": vars["iki_b_h"].get(), "iki_b_m": vars["iki_b_m"].get(),
-            "kaeri_type": vars["kaeri_type"].get(),
-            "kaeri_a_h": vars["kaeri_a_h"].get(), "kaeri_a_m": vars["kaeri_a_m"].get(),
-            "kaeri_b_h": vars["kaeri_b_h"].get(), "kaeri_b_m": vars["kaeri_b_m"].get(),
-            "subjects": [
-                {"subject": s["subject"].get(), "teacher": s["teacher_var"].get()}
-                for s in vars["subjects"]
-            ]
-        }
+        profile_data = self.get_form_values(side)
 
-        filepath = os.path.join(PROFILE_DIR, f"{profile_name}.json")
         try:
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(profile_data, f, ensure_ascii=False, indent=4)
+            with timing.span("profile_save"):
+                created = self.profile_store.save(profile_name, profile_data)
             messagebox.showinfo("成功", f"プロファイル '{profile_name}' を保存しました。")
-            self.update_profile_list() # 両方のリストを更新
+            if created: # 新しい名前だけをリストに追加する
+                bisect.insort(self.profile_names, profile_name)
+                self.update_profile_list() # 両方のリストを更新
         except Exception as e:
             messagebox.showerror("エラー", f"プロファイルの保存に失敗しました:\n{e}")
 
     def load_profile(self, side):
-        """JSONプロファイルからフォームの内容を復元する"""
+        """プロファイルからフォームの内容を復元する"""
         profile_name = self.form_vars[side]["profile_name"].get()
         if not profile_name:
             messagebox.showerror("エラー", "読み込むプロファイルを選択してください。")
             return
 
-        filepath = os.path.join(PROFILE_DIR, f"{profile_name}.json")
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                profile_data = json.load(f)
-            self.set_form_from_data(side, profile_data)
+            with timing.span("profile_load"):
+                profile_data = self.profile_store.load(profile_name)
+            if profile_data is None:
+                messagebox.showerror("エラー", f"プロファイル '{profile_name}' が見つかりません。")
+                return
+            with timing.span("profile_apply"):
+                self.set_form_from_data(side, profile_data)
             messagebox.showinfo("成功", f"プロファイル '{profile_name}' を読み込みました。")
-        except FileNotFoundError:
-            messagebox.showerror("エラー", f"プロファイル '{profile_name}' が見つかりません。")
         except Exception as e:
             messagebox.showerror("エラー", f"プロファイルの読み込みに失敗しました:\n{e}")
 
@@ -324,12 +505,11 @@ class Application(tk.Tk):
         """辞書データからフォームの値を設定する"""
         vars = self.form_vars[side]
         # 単純なStringVar
-        for key in ["name", "class", "student_number", "department", "gakuseki",
-                    "year", "month", "day", "visit_dest", "nearest_station", "reason",
-                    "iki_type", "iki_a_h", "iki_a_m", "iki_b_h", "iki_b_m",
-                    "kaeri_type", "kaeri_a_h", "kaeri_a_m", "kaeri_b_h", "kaeri_b_m"]:
+        for key in PROFILE_KEYS:
             if key in data:
                 vars[key].set(data[key])
+        if "name" in data:
+            vars["student_name"] = data["name"] # プロファイルの学生情報は、その氏名と組で扱う
 
         # 科目情報
         if "subjects" in data:
@@ -341,23 +521,48 @@ class Application(tk.Tk):
                     self.on_subject_select(None, side, i)
                     subject_info["teacher_var"].set(sub_data.get("teacher", ""))
 
+    def update_student_list(self, side):
+        """入力中の氏名（またはカナ）で前方一致検索し、候補を更新する"""
+        rows = self.reference.roster.search(self.form_vars[side]["name"].get(), STUDENT_LIST_LIMIT)
+        self.form_vars[side]["student_rows"] = rows
+        self.form_vars[side]["name_cb"]["values"] = [self.reference.roster.label(row) for row in rows]
+
+    def on_student_typed(self, event, side):
+        if event.keysym not in ("Up", "Down", "Return", "Escape", "Tab"):
+            self.update_student_list(side)
+            # 選択した学生と違う氏名になったら、その学生のクラスなどは使わない
+            if _name_key(self.form_vars[side]["name"].get()) != _name_key(self.form_vars[side]["student_name"]):
+                self.clear_student(side)
+
+    def on_student_focus_out(self, event, side):
+        """氏名を入力しただけで選択していない場合、名簿で1人に決まればその学生にする"""
+        vars = self.form_vars[side]
+        if vars["student_name"] or not vars["name"].get():
+            return
+        rows = self.reference.roster.by_name.get(vars["name"].get().strip(), [])
+        if len(rows) == 1:
+            self.set_student(side, rows[0])
+
     def on_student_select(self, event, side):
         """学生が選択されたら学籍番号を自動入力"""
-        name = self.form_vars[side]["name"].get()
-        entries = self.form_vars[side]["entries"]
-        for s in self.students:
-            if s["氏名"] == name:
-                for key, entry_widget in entries.items():
-                    entry_widget.config(state="normal")
-
-                self.form_vars[side]["class"].set(s.get("クラス", ""))
-                self.form_vars[side]["student_number"].set(s.get("出席番号", ""))
-                self.form_vars[side]["department"].set(s.get("学科", ""))
-                self.form_vars[side]["gakuseki"].set(s.get("学籍番号", ""))
-
-                for key, entry_widget in entries.items():
-                    entry_widget.config(state="readonly")
-                break
+        index = self.form_vars[side]["name_cb"].current()
+        if index < 0:
+            return
+        self.set_student(side, self.form_vars[side]["student_rows"][index])
+
+    def set_student(self, side, row):
+        s = self.reference.roster.record(row)
+        vars = self.form_vars[side]
+        vars["name"].set(s["氏名"]) # 表示用の「氏名 (学籍番号)」を氏名だけにする
+        vars["student_name"] = s["氏名"]
+        for key, field in STUDENT_FIELDS.items():
+            vars[key].set(s[field])
+
+    def clear_student(self, side):
+        vars = self.form_vars[side]
+        vars["student_name"] = ""
+        for key in STUDENT_FIELDS:
+            vars[key].set("")
 
     def on_subject_select(self, event, side, index): # eventはNoneの場合がある
         """科目が選択されたら教員名を自動入力"""
@@ -366,110 +571,136 @@ class Application(tk.Tk):
         teacher_cb = subject_info["teacher_cb"]
         teacher_var = subject_info["teacher_var"]
 
-        for s in self.subjects:
-            if s["name"] == sub_name and "teacher" in s:
-                teacher = s["teacher"]
-                # 以前の値をクリア
-                teacher_cb.set('')
-                teacher_cb.config(values=[])
-                if isinstance(teacher, list):
-                    # 複数の教員がいる場合は選択式にする
-                    teacher_cb.config(values=teacher, state="readonly")
-                    teacher_var.set(teacher[0]) # デフォルトで最初の教員を選択
-                else:
-                    # 教員が一人だけの場合はそれを設定
-                    teacher_cb.config(values=[teacher], state="readonly")
-                    teacher_var.set(teacher)
-                break
-        else: # ループがbreakしなかった場合（科目が空欄など）
-            teacher_cb.set('')
+        teachers = self.reference.teachers.get(sub_name)
+        # 以前の値をクリア
+        teacher_cb.set('')
+        if teachers is not None:
+            # 複数の教員がいる場合は選択式にする（デフォルトで最初の教員を選択）
+            teacher_cb.config(values=teachers, state="readonly")
+            teacher_var.set(teachers[0])
+        else: # 科目が見つからない場合（科目が空欄など）
             teacher_cb.config(values=[], state="readonly")
 
+    def get_form_record(self, side):
+        """フォームの現在の内容をFormRecordとして取得する"""
+        vars = self.form_vars[side]
+        return FormRecord(
+            *(vars[key].get() for key in PROFILE_KEYS),
+            subjects=[subject_entry(s["subject"].get(), s["teacher_var"].get()) for s in vars["subjects"]],
+        )
+
+    def get_form_values(self, side):
+        """フォームの現在の内容をプロファイルと同じ形式の辞書として取得する"""
+        return self.get_form_record(side).to_profile()
 
     def get_form_data(self, side):
         """GUIの入力値から、FormDrawer用の辞書を作成する"""
-        vars = self.form_vars[side]
-        data = {
-            "氏名": vars["name"].get(),
-            "学籍番号": vars["gakuseki"].get(),
-            "クラス": vars["class"].get(),
-            "出席番号": vars["student_number"].get(),
-            "学科": vars["department"].get(),
-            "訪問日_年": vars["year"].get(),
-            "訪問日_月": vars["month"].get(),
-            "訪問日_日": vars["day"].get(),
-            "訪問先": vars["visit_dest"].get(),
-            "最寄り駅": vars["nearest_station"].get(),
-            "内容": vars["reason"].get(),
-        }
+        return self.get_form_record(side).to_drawer_data()
+
+    def schedule_preview(self, side):
+        """連続した入力をまとめ、入力が止まってから片側だけ描き直す"""
+        if side in self.preview_after:
+            self.after_cancel(self.preview_after[side])
+        self.preview_after[side] = self.after(PREVIEW_DELAY_MS, lambda: self.update_preview(side))
+
+    def update_preview(self, side):
+        del self.preview_after[side]
+        self.render_worker.submit(
+            f"preview-{side}", self.run_preview,
+            ("update", self.preview_type.get(), side, self.get_form_data(side)),
+            on_done=self.show_preview, on_error=self.on_preview_error,
+        )
+
+    def refresh_preview(self):
+        self.render_worker.submit(
+            "preview", self.run_preview, ("refresh", self.preview_type.get()),
+            on_done=self.show_preview, on_error=self.on_preview_error,
+        )
+
+    def run_preview(self, method, *args):
+        """ワーカースレッドで SheetPreview のメソッドを呼ぶ"""
+        if self.preview is None:
+            from preview import SheetPreview
+            self.preview = SheetPreview()
+        return getattr(self.preview, method)(*args)
+
+    def show_preview(self, img):
+        from PIL import ImageTk # ワーカースレッドで読み込み済み
+        self.preview_image = ImageTk.PhotoImage(img)
+        self.preview_label.config(image=self.preview_image, text="")
+
+    def on_preview_error(self, error):
+        self.preview_image = None
+        self.preview_label.config(image="", text=f"プレビューを表示できません:\n{error}")
 
-        try:
-            year = int(vars["year"].get())
-            month = int(vars["month"].get())
-            day = int(vars["day"].get())
-            weekday_str = "月火水木金土日"[datetime(year, month, day).weekday()]
-            data["訪問日_曜日"] = weekday_str
-        except (ValueError, TypeError):
-            data["訪問日_曜日"] = ""
-
-        for i, sub_var in enumerate(vars["subjects"], 1):
-            data[f"科目{i}_科目名"] = sub_var["subject"].get()
-            data[f"科目{i}_担当教員"] = sub_var["teacher_var"].get()
-
-        iki_type = vars["iki_type"].get()
-        kaeri_type = vars["kaeri_type"].get()
-
-        data["行き_区分"] = iki_type
-        data["帰り_区分"] = kaeri_type
-
-        if iki_type == 'a':
-            data["行きa_時間"] = vars["iki_a_h"].get()
-            data["行きa_分"] = vars["iki_a_m"].get()
+    def generate(self, application_type): # 'out' or 'in'
+        # フォームの内容はメインスレッドで確定させてからワーカーに渡す
+        form_data_left = self.get_form_data("left")
+        form_data_right = self.get_form_data("right")
+        output_format = self.output_format.get()
+        if output_format in DOCUMENT_FORMATS:
+            encoder = None
+            output_path = os.path.splitext(OUTPUT_PATH)[0] + DOCUMENT_FORMATS[output_format]
         else:
-            data["行きb_時間"] = vars["iki_b_h"].get()
-            data["行きb_分"] = vars["iki_b_m"].get()
-
-        if kaeri_type == 'a':
-            data["帰りa_時間"] = vars["kaeri_a_h"].get()
-            data["帰りa_分"] = vars["kaeri_a_m"].get()
+            encoder = output_format
+            output_path = os.path.splitext(OUTPUT_PATH)[0] + ENCODERS[encoder].ext
+
+        self.set_generating(True)
+        self.render_worker.submit(
+            "generate", _render_to_file,
+            (application_type, form_data_left, form_data_right, output_path, encoder),
+            on_done=self.on_generate_done, on_error=self.on_generate_error,
+        )
+
+    def show_encoder_report(self):
+        """現在の入力内容で、エンコーダーごとの時間とサイズを比較して表示する"""
+        self.render_worker.submit(
+            "encoder-report", _compare_encoders_for,
+            (self.preview_type.get(), self.get_form_data("left"), self.get_form_data("right")),
+            on_done=lambda report: messagebox.showinfo("エンコード比較", report),
+            on_error=self.on_encoder_report_error,
+        )
+
+    def on_encoder_report_error(self, error):
+        # 作成中のジョブがあってもボタンや進捗表示は変えない
+        messagebox.showerror("エラー", f"エンコード比較に失敗しました:\n{error}")
+
+    def export_trace(self):
+        """計測した区間をChromeのトレース形式で保存する"""
+        path = filedialog.asksaveasfilename(defaultextension=".json", initialfile="trace.json",
+                                            filetypes=[("Trace JSON", "*.json")])
+        if path:
+            count = timing.export_chrome_trace(path)
+            messagebox.showinfo("成功", f"{count} 件の区間を書き出しました:\n{path}")
+
+    def set_generating(self, generating):
+        """作成中はボタンを無効にし、進捗表示を動かす"""
+        for btn in self.generate_buttons:
+            btn.config(state="disabled" if generating else "normal")
+        if generating:
+            self.progress.start(10)
         else:
-            data["帰りb_時間"] = vars["kaeri_b_h"].get()
-            data["帰りb_分"] = vars["kaeri_b_m"].get()
-
-        return data
-
-    def generate(self, application_type): # 'out' or 'in'
+            self.progress.stop()
+
+    def on_generate_done(self, output_path):
+        self.set_generating(False)
+        if timing.is_enabled():
+            self.timing_label.config(text="前回の作成: " + timing.format_breakdown("generate"))
+        cache = default_cache()
+        if cache is not None:
+            stats = cache.stats()
+            self.cache_label.config(text=f"キャッシュ: ヒット {stats['hits']} / ミス {stats['misses']}")
+        messagebox.showinfo("成功", f"画像を作成しました:\n{output_path}")
         try:
-            if application_type == "out":
-                image_pos_path = IMAGE_POSITIONS_OUT
-                circ_pos_path = CIRC_POSITIONS_OUT
-                image_path = IMAGE_PATH_OUT
-            else: # "in"
-                image_pos_path = IMAGE_POSITIONS_IN
-                circ_pos_path = CIRC_POSITIONS_IN
-                image_path = IMAGE_PATH_IN
-
-            with open(image_pos_path, "r", encoding="utf-8") as f:
-                image_pos = json.load(f)
-            with open(circ_pos_path, "r", encoding="utf-8") as f:
-                circ_pos = json.load(f)
-
-            form_data_left = self.get_form_data("left")
-            form_data_right = self.get_form_data("right")
-
-            img = Image.open(image_path)
-            drawer = FormDrawer(FONT_PATH)
-
-            drawer.draw(img, form_data_left, image_pos["left"], circ_pos["left"])
-            drawer.draw(img, form_data_right, image_pos["right"], circ_pos["right"])
-
-            img.save(OUTPUT_PATH)
-            messagebox.showinfo("成功", f"画像を作成しました:\n{OUTPUT_PATH}")
-
-            os.startfile(OUTPUT_PATH)
-
-        except Exception as e:
-            messagebox.showerror("エラー", f"処理中にエラーが発生しました:\n{e}")
+            os.startfile(output_path)
+        except AttributeError: # Windows以外
+            pass
+        except OSError as e: # 拡張子に関連付けられたアプリがない場合など
+            messagebox.showwarning("警告", f"作成したファイルを開けませんでした:\n{e}")
+
+    def on_generate_error(self, error):
+        self.set_generating(False)
+        messagebox.showerror("エラー", f"処理中にエラーが発生しました:\n{error}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,76 @@
+"""プレビュー用の縮小画像を作成する
+
+左右それぞれの描画結果を縮小した「レイヤー」として保持し、変更された側だけを
+描き直して元画像の縮小版に重ねる。JPEGへの保存・読み込みは行わない。
+元画像はプレビューの大きさを下回らない範囲で縮小したものを使い、文字や丸印は
+元の解像度の白紙に描いてから縮小する（FormDrawer には出力と同じ位置JSONを渡す）。
+"""
+from PIL import Image, ImageChops
+
+from settings import SIDES
+from template_cache import get_template, reduce_for_size
+
+PREVIEW_SIZE = (480, 340)
+
+
+class SheetPreview:
+    """描画ワーカーのスレッドからのみ使うこと"""
+
+    def __init__(self, size=PREVIEW_SIZE):
+        self.size = size
+        self._template_parts = None # 最後に使ったテンプレートの中身（変更検知用）
+        self._base_thumb = None
+        self._layers = {}        # side -> (縮小画像, マスク)
+        self._form_data = {}     # side -> 最後に描画したフォームの内容
+
+    def _thumbnail(self, img):
+        thumb = img.copy()
+        thumb.thumbnail(self.size, Image.BILINEAR)
+        return thumb
+
+    def _check_template(self, template):
+        """テンプレート（申請書の種類・位置JSON・元画像）が変わっていたら両側を描き直す"""
+        parts = (template.base_image, template.image_pos, template.circ_pos, template.drawer, template.plans)
+        if self._template_parts is not None and all(a is b for a, b in zip(parts, self._template_parts)):
+            return False
+        if self._template_parts is None or template.base_image is not self._template_parts[0]:
+            self._base_thumb = self._thumbnail(template.base_image)
+        self._template_parts = parts
+        self._layers.clear()
+        for side, form_data in self._form_data.items():
+            self._draw_layer(template, side, form_data)
+        return True
+
+    def _draw_layer(self, template, side, form_data):
+        img = template.new_layer()
+        template.draw(img, side, form_data)
+        # 元画像の縮小版と位置がずれないよう、同じ大きさに縮小する
+        thumb = img.resize(self._base_thumb.size, Image.BILINEAR, reducing_gap=2.0)
+        # 白紙との差分を、重ね合わせ用のマスクにする
+        diff = ImageChops.invert(thumb).convert("L")
+        mask = diff.point(lambda v: min(255, v * 4))
+        self._layers[side] = (thumb, mask)
+
+    def _template(self, application_type):
+        return get_template(application_type, reduce_for_size(application_type, self.size))
+
+    def update(self, application_type, side, form_data):
+        """片側のフォームの内容を反映したプレビュー画像を返す"""
+        template = self._template(application_type)
+        self._form_data[side] = form_data
+        if not self._check_template(template):
+            self._draw_layer(template, side, form_data)
+        return self.compose()
+
+    def refresh(self, application_type):
+        """申請書の種類やテンプレートの変更だけを反映したプレビュー画像を返す"""
+        self._check_template(self._template(application_type))
+        return self.compose()
+
+    def compose(self):
+        preview = self._base_thumb.copy()
+        for side in SIDES:
+            if side in self._layers:
+                thumb, mask = self._layers[side]
+                preview.paste(thumb, (0, 0), mask)
+        return preview
@@ -0,0 +1,157 @@
+"""プロファイルを1つのSQLiteファイルにまとめて保存する
+
+使い方:
+    python profile_store.py import profile/   # 既存の profile/*.json を取り込む
+    python profile_store.py export backup/    # 1プロファイル1ファイルのJSONに書き出す
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+from settings import PROFILE_DB
+
+# 前方一致検索の上限に使う（どの文字よりも大きい）
+_MAX_CHAR = "\U0010ffff"
+# profile/*.json の取り込みが済んだことを記録する meta テーブルのキー
+_JSON_IMPORTED = "json_imported"
+
+
+class ProfileStore:
+    def __init__(self, path=PROFILE_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS profiles ("
+                " name TEXT PRIMARY KEY,"
+                " body TEXT NOT NULL,"
+                " updated REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def close(self):
+        self._conn.close()
+
+    def get_meta(self, key, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+
+    def names(self, prefix="", limit=None):
+        """プロファイル名を名前順で返す（prefixで前方一致検索）"""
+        sql = "SELECT name FROM profiles WHERE name >= ? AND name < ? ORDER BY name"
+        params = [prefix, prefix + _MAX_CHAR]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [row[0] for row in self._conn.execute(sql, params)]
+
+    def exists(self, name):
+        return self._conn.execute("SELECT 1 FROM profiles WHERE name = ?", (name,)).fetchone() is not None
+
+    def load(self, name):
+        """プロファイルの内容を返す。存在しない場合はNone"""
+        row = self._conn.execute("SELECT body FROM profiles WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, name, data):
+        """プロファイルを保存する。新規作成の場合はTrueを返す"""
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        with self._conn: # 1トランザクションで書き込む
+            created = not self.exists(name)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO profiles (name, body, updated) VALUES (?, ?, ?)",
+                (name, body, time.time()),
+            )
+        return created
+
+    def delete(self, name):
+        with self._conn:
+            return self._conn.execute("DELETE FROM profiles WHERE name = ?", (name,)).rowcount > 0
+
+    def import_dir(self, dir_path):
+        """1プロファイル1ファイルのJSONをまとめて取り込み、(件数, 読み込めなかったファイルのリスト) を返す
+
+        読み込めなかったファイルは [(パス, 例外), ...] で、それ以外のファイルは取り込む。
+        """
+        rows = []
+        errors = []
+        now = time.time()
+        for filename in sorted(os.listdir(dir_path)):
+            if not filename.endswith(".json"):
+                continue
+            filepath = os.path.join(dir_path, filename)
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e: # 壊れたファイル・文字コードの違うファイルなど
+                errors.append((filepath, e))
+                continue
+            body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+            rows.append((filename[:-len(".json")], body, now))
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO profiles (name, body, updated) VALUES (?, ?, ?)", rows)
+        return len(rows), errors
+
+    def migrate_json_dir(self, dir_path):
+        """初回だけ profile/*.json を取り込み、(件数, 読み込めなかったファイルのリスト) を返す
+
+        取り込みが済んだことは meta テーブルに記録するので、その後すべてのプロファイルを
+        削除しても、古いJSONから取り込み直すことはない。
+        """
+        if self.get_meta(_JSON_IMPORTED) is not None:
+            return 0, []
+        if self.count() == 0:
+            count, errors = self.import_dir(dir_path)
+        else: # 記録を始める前のバージョンで取り込み済み
+            count, errors = 0, []
+        self.set_meta(_JSON_IMPORTED, time.time())
+        return count, errors
+
+    def export_dir(self, dir_path):
+        """すべてのプロファイルを1プロファイル1ファイルのJSONに書き出し、件数を返す"""
+        os.makedirs(dir_path, exist_ok=True)
+        count = 0
+        for name, body in self._conn.execute("SELECT name, body FROM profiles ORDER BY name"):
+            filepath = os.path.join(dir_path, f"{name}.json")
+            tmp_path = filepath + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(json.loads(body), f, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, filepath)
+            count += 1
+        return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="プロファイルの一括取り込み・書き出し")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("directory", help="JSONファイルのディレクトリ")
+    parser.add_argument("--db", default=PROFILE_DB, help="プロファイルのデータベース")
+    args = parser.parse_args(argv)
+
+    store = ProfileStore(args.db)
+    try:
+        if args.command == "import":
+            count, errors = store.import_dir(args.directory)
+            print(f"{count} 件のプロファイルを取り込みました")
+            for path, e in errors:
+                print(f"読み込めませんでした: {path}: {e}")
+        else:
+            count = store.export_dir(args.directory)
+            print(f"{count} 件のプロファイルを書き出しました")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""科目・名簿・レイアウトの参照データ
+
+科目名から教員のリストを引ける辞書と名簿の索引を一度だけ作り、
+ファイルの更新日時を poll() で確認して、変わったファイルだけを読み直す。
+"""
+import json
+import os
+
+import timing
+from roster import Roster
+from settings import STUDENT_JSON, SUBJECT_JSON, template_paths
+
+LAYOUT_PATHS = template_paths("out") + template_paths("in")
+
+
+def load_json(path):
+    with timing.span(f"load_json:{os.path.basename(path)}"):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class ReferenceData:
+    def __init__(self, subject_path=SUBJECT_JSON, student_path=STUDENT_JSON, layout_paths=LAYOUT_PATHS):
+        self.subjects = []
+        self.subject_names = []
+        self.teachers = {} # 科目名 -> 教員のリスト
+        self.roster = Roster()
+        # 種類 -> 監視するファイル
+        self._watched = {
+            "subjects": [subject_path],
+            "roster": [student_path],
+            "layout": list(layout_paths),
+        }
+        self._mtimes = {}
+
+    def set_subjects(self, subjects):
+        # poll() はワーカースレッドでも呼ばれるので、作り終えてから差し替える
+        teachers = {}
+        for d in subjects:
+            if "teacher" in d:
+                teacher = d["teacher"]
+                teachers.setdefault(d["name"], teacher if isinstance(teacher, list) else [teacher])
+        self.subjects = subjects
+        self.subject_names = [d["name"] for d in subjects]
+        self.teachers = teachers
+
+    def _load(self, kind, path):
+        if kind == "subjects":
+            self.set_subjects(load_json(path))
+        elif kind == "roster":
+            with timing.span(f"load_roster:{os.path.basename(path)}"):
+                self.roster = Roster.load(path)
+        # レイアウトはtemplate_cacheが次の描画時に読み直す
+
+    def poll(self):
+        """更新されたファイルを読み直し、(変わった種類のリスト, [(パス, 例外), ...]) を返す
+
+        読み込みに失敗したファイルも更新日時は記録し、次に変更されるまで再試行しない。
+        """
+        changed = []
+        errors = []
+        for kind, paths in self._watched.items():
+            mtimes = tuple(_mtime(path) for path in paths)
+            if self._mtimes.get(kind) == mtimes:
+                continue
+            self._mtimes[kind] = mtimes
+            try:
+                self._load(kind, paths[0])
+            except Exception as e:
+                errors.append((paths[0], e))
+                continue
+            changed.append(kind)
+        return changed, errors
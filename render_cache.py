@@ -0,0 +1,149 @@
+"""描画結果のキャッシュ
+
+左右のフォームの内容・申請書の種類・出力形式と、テンプレート・位置JSON・
+フォント・FormDrawerのソースの更新日時とサイズ（レイアウトプランを使う場合は
+そのバージョンも）からハッシュを作り、エンコード済みのバイト列を
+ディスクに保存する。合計サイズが上限を超えたら、最後に使ってから最も時間が
+経ったものから削除する（LRU）。
+"""
+import collections
+import hashlib
+import json
+import os
+import threading
+
+from layout_plan import PLAN_VERSION
+from settings import FONT_PATH, FORM_DRAWER_PATH, LAYOUT_PLAN, RENDER_CACHE_DIR, RENDER_CACHE_MAX_BYTES, template_paths
+
+
+def template_fingerprint(application_type):
+    """テンプレート関連ファイルの (パス, 更新日時, サイズ) のリスト（描画方法も含める）"""
+    fingerprint = []
+    # 描画するコードが変わった場合（git submodule update など）も作り直す
+    for path in template_paths(application_type) + (FONT_PATH, FORM_DRAWER_PATH):
+        st = os.stat(path)
+        fingerprint.append((path, st.st_mtime_ns, st.st_size))
+    if LAYOUT_PLAN: # プランの扱いが変わった場合も作り直す
+        fingerprint.append(("layout_plan", PLAN_VERSION))
+    return fingerprint
+
+
+class RenderCache:
+    def __init__(self, cache_dir=RENDER_CACHE_DIR, max_bytes=RENDER_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._sizes = collections.OrderedDict() # キー -> バイト数（古い順）
+        self._total = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        entries = []
+        for entry in os.scandir(cache_dir):
+            if entry.is_file() and entry.name.endswith(".bin"):
+                st = entry.stat()
+                entries.append((st.st_mtime_ns, entry.name[:-len(".bin")], st.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self._total += size
+
+    def key(self, application_type, form_data_left, form_data_right, variant="", fingerprint=None):
+        """キャッシュのキーを作る（variant には出力形式などを入れる）"""
+        payload = {
+            "type": application_type,
+            "left": form_data_left,
+            "right": form_data_right,
+            "variant": variant,
+            "template": fingerprint if fingerprint is not None else template_fingerprint(application_type),
+        }
+        text = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def slots_key(self, application_type, slots, variant="", fingerprint=None):
+        """面付けした1枚（{面の名前: フォームの内容}）のキャッシュのキーを作る"""
+        payload = {
+            "type": application_type,
+            "slots": slots,
+            "variant": variant,
+            "template": fingerprint if fingerprint is not None else template_fingerprint(application_type),
+        }
+        text = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".bin")
+
+    def get(self, key):
+        """キャッシュ済みのバイト列を返す。なければNone"""
+        with self._lock:
+            if key not in self._sizes:
+                self.misses += 1
+                return None
+            self._sizes.move_to_end(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            os.utime(self._path(key)) # 次回起動時のLRUの順番に使う
+        except FileNotFoundError: # 別のプロセスが削除した
+            with self._lock:
+                self._total -= self._sizes.pop(key, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        with self._lock:
+            self._total += len(data) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._sizes:
+            key, size = self._sizes.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def copy_to(self, key, path):
+        """キャッシュにあれば path に書き出して True を返す"""
+        data = self.get(key)
+        if data is None:
+            return False
+        with open(path, "wb") as f:
+            f.write(data)
+        return True
+
+    def put_file(self, key, path):
+        with open(path, "rb") as f:
+            self.put(key, f.read())
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self._sizes), "bytes": self._total}
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """プロセス内で共有するキャッシュ（上限が0なら無効でNone）"""
+    global _default_cache
+    if RENDER_CACHE_MAX_BYTES <= 0:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = RenderCache()
+        return _default_cache
@@ -0,0 +1,57 @@
+"""描画サーバー（render_service.py）のクライアント（PILに依存しない）"""
+import json
+import os
+import urllib.error
+import urllib.request
+
+from encoders import get_encoder
+
+
+class RenderServiceBusy(Exception):
+    """サーバーの受付数が上限に達している（429）か、ワーカーを再起動している（503）"""
+
+
+class RenderClient:
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _open(self, request):
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            if e.code in (429, 503):
+                raise RenderServiceBusy(message) from None
+            raise RuntimeError(f"描画サーバーのエラー ({e.code}): {message}") from None
+
+    def render(self, application_type, form_data_left, form_data_right, ext=None, encoder=None):
+        """サーバーで描画し、エンコード済みのバイト列を返す"""
+        body = json.dumps({
+            "application_type": application_type,
+            "left": form_data_left,
+            "right": form_data_right,
+            "encoder": encoder,
+            "ext": ext,
+        }, ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(f"{self.url}/render", data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        with self._open(request) as response:
+            return response.read()
+
+    def render_to_file(self, application_type, form_data_left, form_data_right, output_path, encoder=None):
+        """render_core.render_to_file() と同じ引数で、サーバーで描画して保存する"""
+        ext = os.path.splitext(output_path)[1].lower() or get_encoder(encoder).ext
+        data = self.render(application_type, form_data_left, form_data_right, ext, encoder)
+        tmp_path = output_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, output_path)
+        return output_path
+
+    def metrics(self):
+        with self._open(urllib.request.Request(f"{self.url}/metrics")) as response:
+            return json.loads(response.read())
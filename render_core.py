@@ -0,0 +1,56 @@
+import os
+
+import timing
+from encoders import compare_encoders, format_report
+from render_cache import default_cache
+from settings import SIDES
+from sheet_output import save_sheet
+from template_cache import get_template
+
+
+def render_sheet(application_type, form_data_left, form_data_right):
+    """左右のフォームを1枚の画像に描画して返す（Noneの側は描画しない）"""
+    return render_slots(application_type, dict(zip(SIDES, (form_data_left, form_data_right))))
+
+
+def render_slots(application_type, slots):
+    """{面の名前: フォームの内容} を1枚の画像に描画して返す（Noneの面は描画しない）"""
+    with timing.span("template"):
+        template = get_template(application_type)
+    with timing.span("copy_base"):
+        img = template.new_sheet()
+    for slot, form_data in slots.items():
+        if form_data is not None:
+            with timing.span(f"draw_{slot}"):
+                template.draw(img, slot, form_data)
+    return img
+
+
+def render_to_file(application_type, form_data_left, form_data_right, output_path, encoder=None):
+    """描画して保存し、保存先のパスを返す（ワーカースレッドから呼ばれる）
+
+    同じ内容・同じテンプレートで作成済みなら、キャッシュしたファイルをそのまま使う。
+    """
+    with timing.span("generate"):
+        cache = default_cache()
+        if cache is not None:
+            with timing.span("cache_lookup"):
+                variant = f"{encoder or ''}{os.path.splitext(output_path)[1].lower()}"
+                key = cache.key(application_type, form_data_left, form_data_right, variant)
+                hit = cache.copy_to(key, output_path)
+            if hit:
+                return output_path
+
+        img = render_sheet(application_type, form_data_left, form_data_right)
+        with timing.span("save"):
+            save_sheet(img, output_path, encoder)
+        if cache is not None:
+            with timing.span("cache_store"):
+                cache.put_file(key, output_path)
+        return output_path
+
+
+def compare_encoders_for(application_type, form_data_left, form_data_right):
+    """現在のテンプレートで描画した1枚について、エンコーダーごとの比較表を返す"""
+    img = render_sheet(application_type, form_data_left, form_data_right)
+    return format_report(compare_encoders(img))
@@ -0,0 +1,310 @@
+"""描画サーバー（標準ライブラリのみ）
+
+フォントとテンプレートを読み込んだ状態のワーカープロセスを常駐させ、
+他のPCのツールからの描画をまとめて引き受ける。
+    python render_service.py --host 0.0.0.0 --port 8765 --workers 2 --queue 8
+
+POST /render   {"application_type": "out", "left": {...}, "right": {...},
+                "encoder": "jpeg-fast", "ext": ".jpg"}
+               left / right は get_form_data() と同じ形式（描画しない側は null）。
+               エンコードした画像をそのまま返す。
+GET  /metrics  リクエスト数・待ち件数・処理時間などをJSONで返す
+GET  /health   起動確認用
+
+処理中と待ちの合計が workers + queue 件を超えると、待たせずに 429 を返す。
+受付数はワーカーでの処理が終わるまで数えるので、時間切れ（504）になった描画も
+終わるまでは上限に含まれる。ワーカープロセスが異常終了した場合は作り直して 503 を返す。
+"""
+import argparse
+import collections
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import template_cache
+from encoders import get_encoder
+from render_cache import default_cache
+from settings import RENDER_SERVICE_PORT
+
+APPLICATION_TYPES = ("out", "in")
+DOCUMENT_EXTS = (".pdf", ".tif", ".tiff")
+MAX_BODY_BYTES = 1024 * 1024
+RENDER_TIMEOUT = 60
+CONTENT_TYPES = {
+    ".jpg": "image/jpeg", ".png": "image/png", ".webp": "image/webp",
+    ".tif": "image/tiff", ".tiff": "image/tiff", ".pdf": "application/pdf",
+}
+
+
+def _init_worker():
+    template_cache.warm(APPLICATION_TYPES)
+
+
+def _render(application_type, form_data_left, form_data_right, ext, encoder):
+    """ワーカープロセスで描画・エンコードし、(バイト列, 描画にかかった秒数) を返す"""
+    from render_core import render_sheet
+    from sheet_output import encode_sheet
+    start = time.perf_counter()
+    img = render_sheet(application_type, form_data_left, form_data_right)
+    return encode_sheet(img, ext, encoder), time.perf_counter() - start
+
+
+class ServiceMetrics:
+    """リクエスト数と処理時間の集計（処理時間は直近 window 件から百分位を求める）"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self._latencies = {} # "request"（受付から応答まで）/ "render"（ワーカーでの描画） -> deque
+        self._started = time.time()
+        self.counts = collections.Counter() # "requests", "rejected", "errors", "cache_hits" など
+        self.in_flight = 0
+
+    def begin(self):
+        with self._lock:
+            self.counts["requests"] += 1
+            self.in_flight += 1
+
+    def end(self, status, seconds):
+        with self._lock:
+            self.in_flight -= 1
+            self.counts[f"status_{status}"] += 1
+        if status == 200:
+            self.observe("request", seconds)
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def observe(self, name, seconds):
+        with self._lock:
+            latencies = self._latencies.get(name)
+            if latencies is None:
+                latencies = self._latencies[name] = collections.deque(maxlen=self._window)
+            latencies.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.counts)
+            data["in_flight"] = self.in_flight
+            samples = {name: sorted(latencies) for name, latencies in self._latencies.items()}
+        data["uptime_s"] = round(time.time() - self._started, 1)
+        data["latency_ms"] = {}
+        for name, latencies in samples.items():
+            pick = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+            data["latency_ms"][name] = {
+                "p50": round(pick(0.5) * 1000, 1),
+                "p95": round(pick(0.95) * 1000, 1),
+                "p99": round(pick(0.99) * 1000, 1),
+                "max": round(latencies[-1] * 1000, 1),
+                "samples": len(latencies),
+            }
+        return data
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class RenderService:
+    """ワーカープロセスと受付数の上限をまとめたもの（HTTPの処理はRenderHandler）"""
+
+    def __init__(self, workers=2, queue_size=8, cache=None):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.cache = cache
+        self.metrics = ServiceMetrics()
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._executor_lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    def _restart_executor(self, broken):
+        """異常終了したワーカーのプールを作り直す（他のスレッドが作り直し済みなら何もしない）"""
+        with self._executor_lock:
+            if self._executor is not broken:
+                return
+            self._executor = self._new_executor()
+        self.metrics.count("pool_restarts")
+        broken.shutdown(wait=False)
+
+    def _release_slot(self, future):
+        self._slots.release()
+
+    def parse(self, body):
+        """リクエストのJSONを (種類, 左, 右, 拡張子, エンコーダー) にする"""
+        try:
+            request = json.loads(body)
+        except ValueError as e:
+            raise RequestError(400, f"JSONとして読めません: {e}") from None
+        if not isinstance(request, dict):
+            raise RequestError(400, "JSONのオブジェクトを送ってください")
+        application_type = request.get("application_type", "out")
+        if application_type not in APPLICATION_TYPES:
+            raise RequestError(400, f"不明な申請書の種類です: {application_type}")
+        left, right = request.get("left"), request.get("right")
+        if not all(side is None or isinstance(side, dict) for side in (left, right)):
+            raise RequestError(400, "left / right はオブジェクトかnullにしてください")
+        encoder, ext = request.get("encoder"), request.get("ext")
+        if not all(value is None or isinstance(value, str) for value in (encoder, ext)):
+            raise RequestError(400, "encoder / ext は文字列かnullにしてください")
+        try:
+            encoder_ext = get_encoder(encoder).ext
+        except ValueError as e:
+            raise RequestError(400, str(e)) from None
+        ext = (ext or encoder_ext).lower()
+        if ext not in (encoder_ext,) + DOCUMENT_EXTS:
+            raise RequestError(400, f"この拡張子では出力できません: {ext}")
+        return application_type, left, right, ext, encoder
+
+    def render(self, body):
+        """描画して (バイト列, 拡張子, キャッシュを使ったか) を返す。混雑時は RequestError(429)"""
+        application_type, left, right, ext, encoder = self.parse(body)
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(application_type, left, right, f"{encoder or ''}{ext}")
+            data = self.cache.get(key)
+            if data is not None:
+                self.metrics.count("cache_hits")
+                return data, ext, True
+
+        if not self._slots.acquire(blocking=False):
+            self.metrics.count("rejected")
+            raise RequestError(429, "描画サーバーが混雑しています")
+        executor = self._executor
+        try:
+            future = executor.submit(_render, application_type, left, right, ext, encoder)
+        except BaseException as e:
+            self._slots.release()
+            if isinstance(e, BrokenProcessPool):
+                self._restart_executor(executor)
+                raise RequestError(503, "ワーカープロセスを再起動しました。もう一度送ってください") from None
+            raise
+        # 受付数は、時間切れで応答を返した後もワーカーでの処理が終わるまで確保しておく
+        future.add_done_callback(self._release_slot)
+        try:
+            data, seconds = future.result(timeout=RENDER_TIMEOUT)
+        except TimeoutError:
+            raise RequestError(504, f"{RENDER_TIMEOUT} 秒以内に描画が終わりませんでした") from None
+        except BrokenProcessPool:
+            self._restart_executor(executor)
+            raise RequestError(503, "ワーカープロセスが異常終了したため再起動しました。もう一度送ってください") from None
+        self.metrics.count("rendered")
+        self.metrics.observe("render", seconds)
+        if key is not None:
+            self.cache.put(key, data)
+        return data, ext, False
+
+    def close(self):
+        with self._executor_lock:
+            executor = self._executor
+        executor.shutdown(cancel_futures=True)
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    server_version = "FormRenderService/1.0"
+    service = None # RenderService（serve() で設定する）
+
+    def _send(self, status, body, content_type, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, data, headers=()):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self._send(status, body, "application/json; charset=utf-8", headers)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            metrics = self.service.metrics.snapshot()
+            metrics["capacity"] = self.service.capacity
+            metrics["workers"] = self.service.workers
+            self._send_json(200, metrics)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _content_length(self):
+        """Content-Length を確認して返す（ないもの・負の数・数字でないものは400）"""
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            raise RequestError(400, "Content-Length を正しく指定してください") from None
+        if length < 0:
+            raise RequestError(400, "Content-Length を正しく指定してください")
+        if length > MAX_BODY_BYTES:
+            raise RequestError(413, "リクエストが大きすぎます")
+        return length
+
+    def do_POST(self):
+        if self.path != "/render":
+            self._send_json(404, {"error": "not found"})
+            return
+        metrics = self.service.metrics
+        metrics.begin()
+        start = time.perf_counter()
+        status = 500
+        try:
+            data, ext, cached = self.service.render(self.rfile.read(self._content_length()))
+            status = 200
+            self._send(200, data, CONTENT_TYPES.get(ext, "application/octet-stream"), [
+                ("X-Render-Cache", "hit" if cached else "miss"),
+                ("X-Render-Ms", f"{(time.perf_counter() - start) * 1000:.1f}"),
+            ])
+        except RequestError as e:
+            status = e.status
+            headers = [("Retry-After", "1")] if status in (429, 503) else []
+            self._send_json(status, {"error": str(e)}, headers)
+        except Exception as e:
+            metrics.count("errors")
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            metrics.end(status, time.perf_counter() - start)
+
+    def log_message(self, format, *args):
+        pass # 1件ごとのログは出さない（集計は /metrics で見る）
+
+
+def serve(host="127.0.0.1", port=RENDER_SERVICE_PORT, workers=2, queue_size=8, use_cache=True):
+    service = RenderService(workers, queue_size, default_cache() if use_cache else None)
+    handler = type("BoundRenderHandler", (RenderHandler,), {"service": service})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    print(f"描画サーバーを起動しました: http://{host}:{httpd.server_port}/ "
+          f"(ワーカー {workers}, 受付上限 {service.capacity})", flush=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="公欠届の描画サーバー")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス（他のPCから使う場合は 0.0.0.0）")
+    parser.add_argument("--port", type=int, default=RENDER_SERVICE_PORT)
+    parser.add_argument("-w", "--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="描画するプロセスの数")
+    parser.add_argument("--queue", type=int, default=8, help="処理中以外に待たせる件数の上限")
+    parser.add_argument("--no-cache", action="store_true", help="描画結果のキャッシュを使わない")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.queue, not args.no_cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""描画処理をTkのメインスレッドの外で実行するワーカー
+
+ジョブはチャンネル（"generate" など）ごとに管理し、同じチャンネルに新しい
+ジョブが投入されると古いジョブは取り消される（実行中なら結果を捨てる）。
+完了・エラーの通知は after() によるポーリングでメインスレッドに戻す。
+"""
+import itertools
+import queue
+import threading
+
+
+class RenderWorker:
+    def __init__(self, widget, poll_ms=50):
+        self._widget = widget
+        self._poll_ms = poll_ms
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._latest = {}   # チャンネル -> 最新のジョブID
+        self._pending = {}  # ジョブID -> (チャンネル, on_done, on_error)
+        self._polling = False
+
+        self._thread = threading.Thread(target=self._run, name="render-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, channel, func, args=(), on_done=None, on_error=None):
+        """ジョブを投入する。同じチャンネルの未完了のジョブは取り消される"""
+        job_id = next(self._ids)
+        with self._lock:
+            superseded = self._latest.get(channel)
+            self._latest[channel] = job_id
+        if superseded is not None:
+            self._pending.pop(superseded, None)
+        self._pending[job_id] = (channel, on_done, on_error)
+        self._jobs.put((job_id, channel, func, args))
+        self._schedule_poll()
+        return job_id
+
+    def cancel(self, channel):
+        """チャンネルの未完了のジョブを取り消す"""
+        with self._lock:
+            job_id = self._latest.pop(channel, None)
+        if job_id is not None:
+            self._pending.pop(job_id, None)
+
+    def is_busy(self, channel):
+        return any(ch == channel for ch, _, _ in self._pending.values())
+
+    def _is_current(self, channel, job_id):
+        with self._lock:
+            return self._latest.get(channel) == job_id
+
+    def _run(self):
+        while True:
+            job_id, channel, func, args = self._jobs.get()
+            if not self._is_current(channel, job_id):
+                continue # 実行前に新しいジョブで置き換えられた
+            try:
+                result, error = func(*args), None
+            except Exception as e:
+                result, error = None, e
+            self._results.put((job_id, channel, result, error))
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self._widget.after(self._poll_ms, self._poll)
+
+    def _poll(self):
+        """メインスレッドで完了したジョブのコールバックを呼ぶ
+
+        コールバックが例外を出しても（Tkが表示する）、次のポーリングは必ず予約する。
+        残りの結果は次のポーリングで渡す。
+        """
+        try:
+            while True:
+                try:
+                    job_id, channel, result, error = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                callbacks = self._pending.pop(job_id, None)
+                if callbacks is None:
+                    continue # 取り消されたジョブの結果は捨てる
+                with self._lock:
+                    if self._latest.get(channel) == job_id:
+                        del self._latest[channel]
+                _, on_done, on_error = callbacks
+                if error is not None:
+                    if on_error:
+                        on_error(error)
+                elif on_done:
+                    on_done(result)
+        finally:
+            if self._pending or not self._results.empty():
+                self._widget.after(self._poll_ms, self._poll)
+            else:
+                self._polling = False
@@ -0,0 +1,99 @@
+"""学生名簿の索引
+
+名簿は列ごとのリストで保持し（1人1辞書にはしない）、学籍番号を主キーに、
+氏名・カナ・クラスから行番号を引ける索引を作る。氏名・カナは前方一致で
+上位N件だけを返す。
+"""
+import bisect
+import csv
+import json
+import sys
+
+FIELDS = ("学籍番号", "氏名", "カナ", "クラス", "出席番号", "学科")
+# カナの列として受け付ける名前
+KANA_KEYS = ("カナ", "フリガナ", "ふりがな")
+# 同じ値が繰り返し現れる列（文字列を共有してメモリを減らす）
+_INTERNED = ("クラス", "学科")
+
+_MAX_CHAR = "\U0010ffff"
+
+
+def _search_key(text):
+    """検索用に空白を取り除く（「山田 太郎」を「山田太」でも引けるように）"""
+    return "".join(text.split())
+
+
+class Roster:
+    def __init__(self, records=()):
+        self.columns = {field: [] for field in FIELDS}
+        self.by_gakuseki = {}
+        self.by_name = {}
+        self.by_kana = {}
+        self.by_class = {}
+        self._sorted_keys = [] # (検索キー, 行番号) を名前順に並べたもの
+        for record in records:
+            self._append(record)
+        self._sorted_keys.sort()
+
+    @classmethod
+    def load(cls, path):
+        """JSON（辞書のリスト）またはCSV（1行目が列名）から読み込む"""
+        if path.lower().endswith(".csv"):
+            with open(path, "r", encoding="utf-8-sig", newline="") as f:
+                return cls(csv.DictReader(f))
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        return len(self.columns["学籍番号"])
+
+    def _append(self, record):
+        row = len(self)
+        kana = next((record[k] for k in KANA_KEYS if record.get(k)), "")
+        values = dict(record, カナ=kana)
+        for field in FIELDS:
+            value = str(values.get(field) or "")
+            if field in _INTERNED:
+                value = sys.intern(value)
+            self.columns[field].append(value)
+
+        gakuseki = self.columns["学籍番号"][row]
+        name = self.columns["氏名"][row]
+        if gakuseki:
+            self.by_gakuseki[gakuseki] = row
+        self.by_name.setdefault(name, []).append(row)
+        if kana:
+            self.by_kana.setdefault(kana, []).append(row)
+            self._sorted_keys.append((_search_key(kana), row))
+        self.by_class.setdefault(self.columns["クラス"][row], []).append(row)
+        self._sorted_keys.append((_search_key(name), row))
+
+    def record(self, row):
+        """1人分を辞書で返す"""
+        return {field: self.columns[field][row] for field in FIELDS}
+
+    def get(self, gakuseki):
+        row = self.by_gakuseki.get(gakuseki)
+        return self.record(row) if row is not None else None
+
+    def rows_in_class(self, class_name):
+        return self.by_class.get(class_name, [])
+
+    def label(self, row):
+        """コンボボックスに表示する文字列（同姓同名を区別するため学籍番号を付ける）"""
+        return f"{self.columns['氏名'][row]} ({self.columns['学籍番号'][row]})"
+
+    def search(self, text, limit=50):
+        """氏名またはカナが text で始まる学生の行番号を名前順に最大 limit 件返す"""
+        key = _search_key(text)
+        start = bisect.bisect_left(self._sorted_keys, (key,))
+        end = bisect.bisect_left(self._sorted_keys, (key + _MAX_CHAR,), start)
+        rows = []
+        seen = set()
+        for _, row in self._sorted_keys[start:end]:
+            if row not in seen: # 氏名とカナの両方で一致した場合は1回だけ
+                seen.add(row)
+                rows.append(row)
+                if len(rows) >= limit:
+                    break
+        return rows
@@ -0,0 +1,48 @@
+import os
+
+# --- 設定 ---
+OUTPUT_PATH = "作成済.jpg"
+FONT_PATH = "./module/imageFormDrawer/fonts/ipaexg.ttf"
+
+# 設定ファイルのパス
+DATA_DIR = "data"
+IMAGE_DIR = os.path.join(DATA_DIR, "image")
+IMAGE_PATH_OUT = os.path.join(IMAGE_DIR, "A4_out.jpg")
+IMAGE_PATH_IN = os.path.join(IMAGE_DIR, "A4_in.jpg")
+IMAGE_POSITIONS_OUT = "./module/imageFormDrawer/json/image_positions-out.json"
+CIRC_POSITIONS_OUT = "./module/imageFormDrawer/json/circles_positions-out.json"
+IMAGE_POSITIONS_IN = "./module/imageFormDrawer/json/image_positions-in.json"
+CIRC_POSITIONS_IN = "./module/imageFormDrawer/json/circles_positions-in.json"
+FORM_DRAWER_PATH = "./module/imageFormDrawer/imageFormDrawer.py" # 描画結果のキャッシュのキーに使う
+SUBJECT_JSON = os.path.join(DATA_DIR, "subject.json")
+STUDENT_JSON = os.path.join(DATA_DIR, "student_data.json")
+PROFILE_DIR = "profile"
+PROFILE_DB = os.path.join(PROFILE_DIR, "profiles.db")
+
+SIDES = ("left", "right")
+SUBJECT_COUNT = 6
+
+
+def template_paths(application_type): # 'out' or 'in'
+    """申請書の種類に対応する (位置JSON, 丸印JSON, 元画像) のパスを返す"""
+    if application_type == "out":
+        return IMAGE_POSITIONS_OUT, CIRC_POSITIONS_OUT, IMAGE_PATH_OUT
+    return IMAGE_POSITIONS_IN, CIRC_POSITIONS_IN, IMAGE_PATH_IN
+
+# 描画結果のキャッシュ（上限を0にすると無効）
+RENDER_CACHE_DIR = ".render_cache"
+RENDER_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# 処理時間の計測ログ（環境変数 FORM_TOOL_TIMING=1 で有効）
+TIMING_LOG_PATH = os.path.join("logs", "timing.log")
+
+# 描画サーバー（render_service.py）。URLを設定するとGUIはサーバーで描画する
+RENDER_SERVICE_PORT = 8765
+RENDER_SERVICE_URL = os.environ.get("FORM_TOOL_RENDER_URL", "")
+
+# FormDrawer がレイアウトプランに対応していれば、コンパイルしたプランで描画する（layout_plan.py）
+# 環境変数 FORM_TOOL_LAYOUT_PLAN=0 で使わない
+LAYOUT_PLAN = os.environ.get("FORM_TOOL_LAYOUT_PLAN", "1") != "0"
+
+# デコード済みのテンプレート画像を保持する最大枚数（元の解像度・縮小版を合わせて）
+TEMPLATE_IMAGES_MAX = int(os.environ.get("FORM_TOOL_TEMPLATE_IMAGES", "4"))
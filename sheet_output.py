@@ -0,0 +1,251 @@
+"""作成した画像の出力先
+
+1枚ごとのファイル、または全ページを1つにまとめたPDF・マルチページTIFFに書き出す。
+PDF・TIFFは1ページずつファイルに書き込むので、ページ数が増えてもメモリに
+保持するのは書き込み中の1ページ分だけになる。
+"""
+import io
+import os
+
+from PIL import Image, TiffImagePlugin
+
+from encoders import get_encoder
+
+OUTPUT_MODES = ("files", "pdf", "tiff")
+# 画像に解像度の情報がない場合に使う値（A4の元画像は150dpi）
+DEFAULT_DPI = 150
+JPEG_QUALITY = 90
+TIFF_COMPRESSION = "tiff_deflate"
+
+
+def _jpeg_ready(img):
+    """JPEGで保存できるモード（RGBかL）に変換する"""
+    if img.mode in ("RGB", "L"):
+        return img
+    return img.convert("L" if img.mode == "1" else "RGB")
+
+
+def _dpi(img):
+    dpi = img.info.get("dpi")
+    return float(dpi[0]) if dpi and dpi[0] else DEFAULT_DPI
+
+
+def _tiff_compression(img, compression=TIFF_COMPRESSION):
+    """白黒のページはFAX形式、それ以外は compression で圧縮する"""
+    return "group4" if img.mode == "1" else compression
+
+
+class SheetFiles:
+    """1枚ごとに別のファイルへ保存する"""
+    page_format = None # ワーカーが直接保存する
+
+    def __init__(self, output_dir, encoder=None):
+        self.output_dir = output_dir
+        self.encoder = get_encoder(encoder)
+        self.count = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def next_path(self):
+        self.count += 1
+        return os.path.join(self.output_dir, f"sheet_{self.count:04d}{self.encoder.ext}")
+
+    def add(self, img):
+        path = self.next_path()
+        self.encoder.save(img, path)
+        return path
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PdfDocument(SheetFiles):
+    """複数ページのPDFを1ページずつ書き出す（各ページはJPEGのまま埋め込む）
+
+    path にはファイルオブジェクトも渡せる（close() では閉じない）。
+    encoder を指定すると各ページをそのモード（グレースケールなど）に変換し、
+    JPEGのエンコーダーならその画質を使う。
+    """
+    page_format = "JPEG"
+
+    def __init__(self, path, encoder=None):
+        self.path = path
+        self.encoder = get_encoder(encoder) if encoder else None
+        self.quality = JPEG_QUALITY
+        if self.encoder and self.encoder.format == "JPEG":
+            self.quality = self.encoder.options.get("quality", JPEG_QUALITY)
+        self.count = 0
+        self._offsets = {} # オブジェクト番号 -> ファイル内の位置
+        self._pages = []   # ページオブジェクトの番号
+        self._next_id = 3  # 1: Catalog, 2: Pages（最後に書く）
+        self._owns_fp = isinstance(path, (str, os.PathLike))
+        self._fp = open(path, "wb") if self._owns_fp else path
+        self._start = self._fp.tell()
+        self._closed = False
+        self._fp.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write_object(self, obj_id, body, stream=None):
+        self._offsets[obj_id] = self._fp.tell() - self._start
+        self._fp.write(f"{obj_id} 0 obj\n".encode() + body)
+        if stream is not None:
+            self._fp.write(b"\nstream\n" + stream + b"\nendstream")
+        self._fp.write(b"\nendobj\n")
+
+    def _new_id(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def add(self, img):
+        if self.encoder:
+            img = self.encoder.prepare(img)
+        img = _jpeg_ready(img)
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=self.quality)
+        self.add_encoded(buf.getvalue(), img.size, img.mode, _dpi(img))
+        return self.path
+
+    def add_encoded(self, jpeg_bytes, size, mode, dpi=DEFAULT_DPI):
+        """JPEGにエンコード済みのページを追加する"""
+        width, height = size
+        image_id, content_id, page_id = self._new_id(), self._new_id(), self._new_id()
+        colorspace = "DeviceGray" if mode == "L" else "DeviceRGB"
+        self._write_object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height}"
+            f" /ColorSpace /{colorspace} /BitsPerComponent 8 /Filter /DCTDecode"
+            f" /Length {len(jpeg_bytes)} >>"
+        ).encode(), jpeg_bytes)
+
+        page_w = width * 72 / dpi
+        page_h = height * 72 / dpi
+        content = f"q {page_w:.2f} 0 0 {page_h:.2f} 0 0 cm /Im0 Do Q".encode()
+        self._write_object(content_id, f"<< /Length {len(content)} >>".encode(), content)
+        self._write_object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w:.2f} {page_h:.2f}]"
+            f" /Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode())
+        self._pages.append(page_id)
+        self.count += 1
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._pages)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>".encode())
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self._fp.tell() - self._start
+        size = self._next_id
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            lines.append(f"{self._offsets[obj_id]:010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        self._fp.write("".join(lines).encode())
+        if self._owns_fp:
+            self._fp.close()
+
+
+class TiffDocument(SheetFiles):
+    """マルチページTIFFを1ページずつ書き出す（白黒のページはFAX形式で圧縮する）
+
+    path にはファイルオブジェクトも渡せる（close() では閉じない）。
+    ワーカーからは圧縮済みの1ページのTIFFを受け取り、デコードせずにそのまま追加する。
+    """
+    page_format = "TIFF"
+
+    def __init__(self, path, encoder=None, compression=TIFF_COMPRESSION):
+        self.path = path
+        self.encoder = get_encoder(encoder) if encoder else None
+        self.compression = compression
+        self.count = 0
+        self._writer = TiffImagePlugin.AppendingTiffWriter(path, new=True)
+        self._closed = False
+
+    def add(self, img):
+        if self.encoder:
+            img = self.encoder.prepare(img)
+        img.save(self._writer, "TIFF", compression=_tiff_compression(img, self.compression), dpi=(_dpi(img),) * 2)
+        self._writer.newFrame() # ページを確定させる
+        self.count += 1
+        return self.path
+
+    def add_encoded(self, data, size=None, mode=None, dpi=None):
+        """encode_page() で1ページのTIFFにしたバイト列を追加する（オフセットはnewFrame()で付け替わる）"""
+        self._writer.write(data)
+        self._writer.newFrame()
+        self.count += 1
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._writer.close()
+
+
+def open_output(mode, path, encoder=None):
+    """mode: 'files'（pathはディレクトリ）, 'pdf', 'tiff'"""
+    if mode == "pdf":
+        return PdfDocument(path, encoder)
+    if mode == "tiff":
+        return TiffDocument(path, encoder)
+    return SheetFiles(path, encoder)
+
+
+def encode_page(img, page_format, encoder=None):
+    """ワーカーからまとめ先のドキュメントへ渡すためにページをエンコードする"""
+    encoder = get_encoder(encoder) if encoder else None
+    if encoder:
+        img = encoder.prepare(img)
+    options = {}
+    if page_format == "JPEG":
+        img = _jpeg_ready(img)
+        options["quality"] = JPEG_QUALITY
+        if encoder and encoder.format == "JPEG":
+            options["quality"] = encoder.options.get("quality", JPEG_QUALITY)
+    elif page_format == "TIFF":
+        options["compression"] = _tiff_compression(img)
+    dpi = _dpi(img)
+    buf = io.BytesIO()
+    img.save(buf, page_format, dpi=(dpi, dpi), **options)
+    return buf.getvalue(), img.size, img.mode, dpi
+
+
+def page_info(data):
+    """エンコード済みのページの (サイズ, モード, dpi) をデコードせずに返す"""
+    with Image.open(io.BytesIO(data)) as img:
+        return img.size, img.mode, _dpi(img)
+
+
+def _document_mode(ext, encoder=None):
+    """拡張子がPDF・TIFFでドキュメントとして書き出す場合はその出力形式、それ以外はNoneを返す"""
+    if ext in (".pdf", ".tif", ".tiff") and not (encoder and get_encoder(encoder).ext == ext):
+        return "pdf" if ext == ".pdf" else "tiff"
+    return None
+
+
+def save_sheet(img, path, encoder=None):
+    """1枚を保存する（.pdf / .tif / .tiff ならドキュメントとして、それ以外はエンコーダーで）"""
+    mode = _document_mode(os.path.splitext(path)[1].lower(), encoder)
+    if mode:
+        with open_output(mode, path, encoder) as doc:
+            doc.add(img)
+    else:
+        get_encoder(encoder).save(img, path)
+    return path
+
+
+def encode_sheet(img, ext, encoder=None):
+    """save_sheet() と同じ規則で、拡張子 ext の形式にエンコードしたバイト列を返す"""
+    buf = io.BytesIO()
+    mode = _document_mode(ext.lower(), encoder)
+    if mode:
+        with open_output(mode, buf, encoder) as doc:
+            doc.add(img)
+    else:
+        get_encoder(encoder).save(img, buf)
+    return buf.getvalue()
@@ -0,0 +1,176 @@
+"""テンプレート（位置JSON・元画像・FormDrawer）のプロセス内キャッシュ
+
+GUI・一括作成・サーバーのどこから描画しても同じキャッシュを使う。
+各ファイルの更新日時が変わった場合はそのファイルだけ読み直す。
+
+プレビューなどの縮小表示には get_template(..., reduce=2/4/8) で、JPEGのdraftモードで
+縮小してデコードした元画像を使う。位置JSONとプランは縮小せず、文字や丸印は
+new_layer() の元の解像度の白紙に FormDrawer で描いてから縮小する（フォントの扱いは
+FormDrawer に任せたままにする）。デコード済みの元画像は TEMPLATE_IMAGES_MAX 枚までしか
+保持せず、古いものから手放す。
+"""
+import collections
+import json
+import os
+import threading
+
+from PIL import Image
+
+import timing
+from layout_plan import compile_layout, draw_side
+from module.imageFormDrawer.imageFormDrawer import FormDrawer
+from settings import FONT_PATH, FORM_DRAWER_PATH, LAYOUT_PLAN, TEMPLATE_IMAGES_MAX, template_paths
+
+REDUCE_FACTORS = (1, 2, 4, 8) # JPEGのdraftモードで縮小できる倍率
+
+_lock = threading.RLock()
+# パス（または (種類, パス)） -> (更新日時, 読み込んだ値)
+_entries = {}
+# (パス, 縮小率) -> (更新日時, デコード済みの画像)。古い順に並ぶ
+_images = collections.OrderedDict()
+
+
+def _mtime(path):
+    return os.stat(path).st_mtime_ns
+
+
+def _cached(path, loader, kind=None):
+    """パスの更新日時が変わっていなければキャッシュ済みの値を返す
+
+    path はパスのタプルでもよい（どれかが変われば読み直す）。同じパスから別の値を
+    作る場合は kind で区別する。
+    """
+    paths = path if isinstance(path, tuple) else (path,)
+    mtime = tuple(_mtime(p) for p in paths)
+    key = path if kind is None else (kind, path)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+        with timing.span(f"load:{kind + ':' if kind else ''}{os.path.basename(paths[0])}"):
+            value = loader(path)
+        _entries[key] = (mtime, value)
+        return value
+
+
+def _load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _load_image(path, reduce=1):
+    """元画像をデコードする（reduce > 1 なら縮小して）"""
+    img = Image.open(path)
+    full_width = img.width
+    if reduce > 1:
+        # JPEGはDCTの段階で縮小してデコードする（元の解像度の画像は作らない）
+        img.draft(img.mode, (img.width // reduce, img.height // reduce))
+    img.load() # ここでデコードしておき、描画ごとにはcopy()だけ行う
+    if reduce > 1 and img.width == full_width: # JPEG以外はデコード後に縮小する
+        img = img.reduce(reduce)
+    return img
+
+
+def _cached_image(path, reduce=1):
+    """デコード済みの元画像を返す（保持するのは最近使った TEMPLATE_IMAGES_MAX 枚まで）"""
+    mtime = _mtime(path)
+    key = (path, reduce)
+    with _lock:
+        entry = _images.get(key)
+        if entry is not None and entry[0] == mtime:
+            _images.move_to_end(key)
+            return entry[1]
+        with timing.span(f"load:{os.path.basename(path)}" + (f"@1/{reduce}" if reduce > 1 else "")):
+            img = _load_image(path, reduce)
+        _images[key] = (mtime, img)
+        _images.move_to_end(key)
+        while len(_images) > max(1, TEMPLATE_IMAGES_MAX):
+            _images.popitem(last=False)
+        return img
+
+
+def image_size(path):
+    """元画像の大きさ（ヘッダーだけを読み、デコードしない）"""
+    def load_size(p):
+        with Image.open(p) as img:
+            return img.size
+    return _cached(path, load_size, "size")
+
+
+def get_drawer():
+    return _cached(FONT_PATH, FormDrawer)
+
+
+def get_plans(application_type):
+    """{側: レイアウトプラン} を返す（無効か、FormDrawer が対応していなければ None）
+
+    元画像はデコードしない。位置JSON・丸印JSON・FormDrawerのソースが変わったら作り直す。
+    """
+    if not LAYOUT_PLAN:
+        return None
+    image_pos_path, circ_pos_path, _ = template_paths(application_type)
+    image_pos = _cached(image_pos_path, _load_json)
+    circ_pos = _cached(circ_pos_path, _load_json)
+    drawer = get_drawer()
+    return _cached((image_pos_path, circ_pos_path, FORM_DRAWER_PATH),
+                   lambda paths: compile_layout(drawer, image_pos, circ_pos), "plans")
+
+
+class Template:
+    """1種類の申請書の描画に必要なものをまとめたもの"""
+    __slots__ = ("application_type", "image_pos", "circ_pos", "base_image", "drawer", "plans", "size")
+
+    def __init__(self, application_type, image_pos, circ_pos, base_image, drawer, plans=None, size=None):
+        self.application_type = application_type
+        self.image_pos = image_pos
+        self.circ_pos = circ_pos
+        self.base_image = base_image
+        self.drawer = drawer
+        self.plans = plans # 側 -> FormDrawer がコンパイルしたプラン（使わない場合はNone）
+        self.size = size or base_image.size # 元の解像度での大きさ（縮小したテンプレートでも同じ）
+
+    def new_sheet(self):
+        """描画用に元画像の複製を返す（キャッシュ上の画像は変更しない）"""
+        return self.base_image.copy()
+
+    def new_layer(self):
+        """元の解像度の白紙を返す（縮小したテンプレートでも位置JSONのまま描画できる）"""
+        return Image.new("RGB", self.size, "white")
+
+    def draw(self, img, side, form_data):
+        """片側を描画する（プランがあれば FormDrawer.draw_plan()、なければ FormDrawer.draw() で）"""
+        draw_side(self.drawer, img, form_data, self.image_pos, self.circ_pos, side, self.plans)
+
+
+def get_template(application_type, reduce=1): # 'out' or 'in'
+    """テンプレートを返す。reduce（2, 4, 8）を指定すると縮小したテンプレートを返す（プレビュー用）"""
+    if reduce not in REDUCE_FACTORS:
+        raise ValueError(f"縮小率は {REDUCE_FACTORS} のいずれかにしてください: {reduce}")
+    image_pos_path, circ_pos_path, image_path = template_paths(application_type)
+    base_image = _cached_image(image_path, reduce)
+    image_pos = _cached(image_pos_path, _load_json)
+    circ_pos = _cached(circ_pos_path, _load_json)
+    size = image_size(image_path) if reduce > 1 else None
+    return Template(application_type, image_pos, circ_pos, base_image, get_drawer(),
+                    get_plans(application_type), size)
+
+
+def reduce_for_size(application_type, size):
+    """size（幅, 高さ）以上の大きさを保てる、最も大きな縮小率を返す"""
+    width, height = image_size(template_paths(application_type)[2])
+    for reduce in reversed(REDUCE_FACTORS):
+        if width // reduce >= size[0] and height // reduce >= size[1]:
+            return reduce
+    return 1
+
+
+def warm(application_types=("out", "in")):
+    """指定した申請書のテンプレートを事前に読み込む"""
+    for application_type in application_types:
+        get_template(application_type)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _images.clear()
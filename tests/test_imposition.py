@@ -0,0 +1,48 @@
+import pytest
+
+from imposition import check_slots, impose, sheet_count
+
+SLOTS = ("left", "right")
+
+
+def test_full_sheets():
+    sheets = list(impose(range(4), SLOTS))
+    assert sheets == [{"left": 0, "right": 1}, {"left": 2, "right": 3}]
+    assert sheet_count(4, SLOTS) == 2
+
+
+def test_iterator_input():
+    assert list(impose(iter(range(2)), SLOTS)) == [{"left": 0, "right": 1}]
+
+
+@pytest.mark.parametrize("partial, expected", [
+    ("blank", [{"left": 0, "right": 1}, {"left": 2}]),
+    ("repeat", [{"left": 0, "right": 1}, {"left": 2, "right": 2}]),
+    ("drop", [{"left": 0, "right": 1}]),
+])
+def test_partial_policies(partial, expected):
+    assert list(impose(range(3), SLOTS, partial)) == expected
+    assert sheet_count(3, SLOTS, partial) == len(expected)
+
+
+def test_three_slots_keep_order():
+    sheets = list(impose("abcde", ("c", "a", "b"), "repeat"))
+    assert sheets == [{"c": "a", "a": "b", "b": "c"}, {"c": "d", "a": "e", "b": "e"}]
+
+
+def test_no_records():
+    assert list(impose([], SLOTS)) == []
+    assert sheet_count(0, SLOTS) == 0
+
+
+def test_unknown_partial_policy():
+    with pytest.raises(ValueError):
+        list(impose(range(3), SLOTS, "shrink"))
+
+
+@pytest.mark.parametrize("slots", [(), ("left", "left"), ("left", "right", "left")])
+def test_bad_slots(slots):
+    with pytest.raises(ValueError):
+        check_slots(slots)
+    with pytest.raises(ValueError):
+        list(impose(range(5), slots))
@@ -0,0 +1,30 @@
+import json
+
+from profile_store import ProfileStore
+
+
+def _write(path, text):
+    path.write_text(text, encoding="utf-8")
+
+
+def test_import_skips_broken_files(tmp_path):
+    _write(tmp_path / "a.json", json.dumps({"name": "A"}))
+    _write(tmp_path / "broken.json", "{")
+    store = ProfileStore(str(tmp_path / "profiles.db"))
+    count, errors = store.import_dir(str(tmp_path))
+    assert count == 1
+    assert [path for path, _ in errors] == [str(tmp_path / "broken.json")]
+    assert store.load("a") == {"name": "A"}
+
+
+def test_migration_runs_once(tmp_path):
+    _write(tmp_path / "a.json", json.dumps({"name": "A"}))
+    store = ProfileStore(str(tmp_path / "profiles.db"))
+    assert store.migrate_json_dir(str(tmp_path)) == (1, [])
+    store.delete("a")
+    store.close()
+
+    # すべて削除した後に起動しても、古いJSONから取り込み直さない
+    store = ProfileStore(str(tmp_path / "profiles.db"))
+    assert store.migrate_json_dir(str(tmp_path)) == (0, [])
+    assert store.count() == 0
@@ -0,0 +1,27 @@
+import io
+
+from PIL import Image, ImageChops
+
+from sheet_output import TiffDocument, encode_page
+
+
+def _page(color, mode="RGB"):
+    return Image.new(mode, (64, 48), color)
+
+
+def test_tiff_frames_from_workers_are_appended_without_decoding():
+    pages = [_page("red"), _page("blue"), _page(0, "1")]
+    buf = io.BytesIO()
+    with TiffDocument(buf) as doc:
+        for img in pages:
+            doc.add_encoded(*encode_page(img, doc.page_format))
+    assert doc.count == len(pages)
+
+    with Image.open(io.BytesIO(buf.getvalue())) as tiff:
+        assert tiff.n_frames == len(pages)
+        for index, img in enumerate(pages):
+            tiff.seek(index)
+            assert tiff.mode == img.mode
+            assert ImageChops.difference(tiff.convert("RGB"), img.convert("RGB")).getbbox() is None
+        tiff.seek(2)
+        assert tiff.info["compression"] == "group4"
@@ -0,0 +1,25 @@
+from form_data import FormRecord
+from validation import ERROR, WARNING, validate_records
+
+
+def _record(**values):
+    profile = {"year": "2026", "month": "10", "day": "19", "iki_type": "b", "kaeri_type": "b",
+               "iki_b_h": "9", "iki_b_m": "0", "kaeri_b_h": "17", "kaeri_b_m": "30"}
+    profile.update(values)
+    return FormRecord.from_profile(profile)
+
+
+def test_valid_record():
+    report = validate_records([_record()])
+    assert report.issues == []
+
+
+def test_null_values_are_reported():
+    report = validate_records([_record(iki_b_h=None, name=None, subjects=None)])
+    assert report.errors == []
+    assert (1, "行きb_時", WARNING, "未入力です") in report.warnings
+
+
+def test_non_numeric_time():
+    report = validate_records([_record(), _record(kaeri_b_m=[30])])
+    assert [(number, field, severity) for number, field, severity, _ in report.errors] == [(2, "帰りb_分", ERROR)]
@@ -0,0 +1,125 @@
+"""処理時間の計測（既定では無効）
+
+    with timing.span("draw_left"):
+        ...
+
+環境変数 FORM_TOOL_TIMING=1 または enable() で有効になる。無効の間は span() は
+何もしないので、計測用のコードを残したままでもほとんど負荷はない。
+有効にすると、各区間を logs/timing.log（ローテーションあり）に記録し、
+Chromeのトレース形式（chrome://tracing や Perfetto で表示できる）に書き出せる。
+"""
+import collections
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+from settings import TIMING_LOG_PATH
+
+MAX_EVENTS = 20000
+
+_enabled = False
+_events = collections.deque(maxlen=MAX_EVENTS) # (名前, 開始(μs), 時間(μs), スレッドID)
+_last = {}  # ルートの区間の名前 -> (時間(秒), [(名前, 深さ, 時間(秒)), ...])
+_lock = threading.Lock()
+_local = threading.local()
+_origin = time.perf_counter()
+logger = logging.getLogger("form_tool.timing")
+
+
+def enable(log_path=TIMING_LOG_PATH):
+    """計測を有効にし、ローテーションするログファイルへの出力を設定する"""
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    if log_path:
+        if os.path.dirname(log_path):
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        handler = RotatingFileHandler(log_path, maxBytes=1024 * 1024, backupCount=3, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+
+def is_enabled():
+    return _enabled
+
+
+class _Span:
+    __slots__ = ("name", "start", "children")
+
+    def __init__(self, name):
+        self.name = name
+        self.children = []
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        duration = end - self.start
+        stack = _local.stack
+        stack.pop()
+        with _lock:
+            _events.append((self.name, (self.start - _origin) * 1e6, duration * 1e6, threading.get_ident()))
+        if stack:
+            # 親の区間に、自分と自分の子の区間を深さ付きで渡す
+            stack[-1].children.append((self.name, len(stack), duration))
+            stack[-1].children.extend(self.children)
+        else:
+            with _lock:
+                _last[self.name] = (duration, self.children)
+        logger.info("%s %.2fms", self.name, duration * 1000)
+        return False
+
+
+_null_span = contextlib.nullcontext()
+
+
+def span(name):
+    """計測する区間。無効の間は何もしない"""
+    if not _enabled:
+        return _null_span
+    return _Span(name)
+
+
+def last_breakdown(name):
+    """ルートの区間 name の直近の (時間(秒), [(名前, 深さ, 時間(秒)), ...]) を返す"""
+    with _lock:
+        return _last.get(name)
+
+
+def format_breakdown(name):
+    """直近の区間の内訳を1行の文字列にする（ステータスバー用）"""
+    breakdown = last_breakdown(name)
+    if breakdown is None:
+        return ""
+    total, children = breakdown
+    parts = [f"{child} {seconds * 1000:.1f}ms" for child, depth, seconds in children if depth == 1]
+    return f"合計 {total * 1000:.1f}ms（" + ", ".join(parts) + "）"
+
+
+def export_chrome_trace(path):
+    """記録した区間をChromeのトレース形式のJSONに書き出す"""
+    pid = os.getpid()
+    with _lock:
+        events = [
+            {"name": name, "ph": "X", "ts": round(start, 1), "dur": round(duration, 1), "pid": pid, "tid": tid}
+            for name, start, duration, tid in _events
+        ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return len(events)
+
+
+if os.environ.get("FORM_TOOL_TIMING") == "1":
+    enable()
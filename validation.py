@@ -0,0 +1,215 @@
+"""描画前の入力チェック（一括作成用）
+
+すべてのレコードを描画の前にまとめて確認し、問題を1つのレポートにする。
+チェックは項目（列）ごとに全レコードを通して行い、同じ値（日付・科目と教員の組・
+文字列の幅など）は1回だけ確認する。
+
+    日付が正しいか（土日は警告）
+    時・分が範囲内の数字か（行き・帰りで選んだ区分のみ）
+    科目が subject.json にあり、教員がその科目の担当か
+    学籍番号・氏名が名簿にあるか
+    文字列が枠に収まるか（FormDrawer がレイアウトプランの text_fits() に対応している場合のみ）
+
+幅の確認は FormDrawer 自身の規則で行い、ここでは位置JSONを解釈しない。
+"""
+import collections
+from datetime import date
+
+from form_data import weekday_of
+
+ERROR = "エラー"
+WARNING = "警告"
+REPORT_LIMIT = 200 # レポートに1件ずつ表示する最大件数
+
+
+class ValidationReport:
+    def __init__(self, record_count):
+        self.record_count = record_count
+        self.issues = [] # (レコード番号（1から）, 項目, 重要度, 内容)
+        self.notes = []  # 実行できなかったチェックなど
+
+    def add(self, index, field, severity, message):
+        self.issues.append((index + 1, field, severity, message))
+
+    def add_rows(self, indexes, field, severity, message):
+        for index in indexes:
+            self.add(index, field, severity, message)
+
+    @property
+    def errors(self):
+        return [issue for issue in self.issues if issue[2] == ERROR]
+
+    @property
+    def warnings(self):
+        return [issue for issue in self.issues if issue[2] == WARNING]
+
+    def format(self, limit=REPORT_LIMIT):
+        issues = sorted(self.issues)
+        lines = [f"{self.record_count} 件を確認しました: エラー {len(self.errors)} 件, 警告 {len(self.warnings)} 件"]
+        for note in self.notes:
+            lines.append(f"  （{note}）")
+        for number, field, severity, message in issues[:limit]:
+            lines.append(f"  {number}件目 [{severity}] {field}: {message}")
+        if len(issues) > limit:
+            lines.append(f"  ...他 {len(issues) - limit} 件")
+        # 同じ内容の問題が多い場合に原因をつかみやすいよう、内容ごとの件数も出す
+        counts = collections.Counter((field, message) for _, field, _, message in issues)
+        if len(issues) > limit:
+            lines.append("内容ごとの件数:")
+            for (field, message), count in counts.most_common(20):
+                lines.append(f"  {count:>6} 件  {field}: {message}")
+        return "\n".join(lines)
+
+
+def _normalize_name(name):
+    return "".join(name.split())
+
+
+def _group(values):
+    """値 -> その値を持つレコードの番号のリスト"""
+    groups = collections.defaultdict(list)
+    for index, value in enumerate(values):
+        groups[value].append(index)
+    return groups
+
+
+def check_dates(report, records):
+    dates = _group((r.year, r.month, r.day) for r in records)
+    this_year = date.today().year
+    for (year, month, day), indexes in dates.items():
+        if not (year or month or day):
+            report.add_rows(indexes, "訪問日", ERROR, "未入力です")
+            continue
+        weekday = weekday_of(year, month, day)
+        if not weekday:
+            report.add_rows(indexes, "訪問日", ERROR, f"日付として正しくありません: {year}/{month}/{day}")
+            continue
+        if abs(int(year) - this_year) > 1:
+            report.add_rows(indexes, "訪問日", WARNING, f"年が今年から離れています: {year}")
+        if weekday in "土日":
+            report.add_rows(indexes, "訪問日", WARNING, f"{year}/{month}/{day} は{weekday}曜日です")
+
+
+def _check_number(value, upper):
+    """0 以上 upper 以下の整数なら None、そうでなければ理由を返す"""
+    if value == "":
+        return "未入力です"
+    try:
+        number = int(value)
+    except (ValueError, TypeError):
+        return f"数字ではありません: {value!r}"
+    if not 0 <= number <= upper:
+        return f"0〜{upper} の範囲外です: {value}"
+    return None
+
+
+def check_times(report, records):
+    for direction, label in (("iki", "行き"), ("kaeri", "帰り")):
+        types = [getattr(r, f"{direction}_type") for r in records]
+        for value, indexes in _group(types).items():
+            if value not in ("a", "b"):
+                report.add_rows(indexes, f"{label}_区分", ERROR, f"a か b を指定してください: {value}")
+        for unit, upper, suffix in (("時", 23, "h"), ("分", 59, "m")):
+            column = [
+                getattr(r, f"{direction}_{kind}_{suffix}") if kind in ("a", "b") else ""
+                for r, kind in zip(records, types)
+            ]
+            for value, indexes in _group(zip(types, column)).items():
+                kind, text = value
+                if kind not in ("a", "b"):
+                    continue
+                problem = _check_number(text, upper)
+                if problem:
+                    severity = WARNING if text == "" else ERROR
+                    report.add_rows(indexes, f"{label}{kind}_{unit}", severity, problem)
+
+
+def check_subjects(report, records, reference):
+    pairs = collections.defaultdict(list) # (科目, 教員) -> [(レコード番号, 科目の番号)]
+    for index, record in enumerate(records):
+        for number, entry in enumerate(record.subjects, 1):
+            if entry.subject or entry.teacher:
+                pairs[(entry.subject, entry.teacher)].append((index, number))
+    for (subject, teacher), places in pairs.items():
+        problem = None
+        severity = ERROR
+        if not subject:
+            problem, severity = f"科目名がないのに教員が入力されています: {teacher}", WARNING
+        elif subject not in reference.teachers and subject not in reference.subject_names:
+            problem = f"subject.json にない科目です: {subject}"
+        elif teacher and teacher not in reference.teachers.get(subject, ()):
+            problem = f"{teacher} は {subject} の担当ではありません"
+        elif not teacher:
+            problem, severity = "担当教員が未入力です", WARNING
+        if problem:
+            for index, number in places:
+                report.add(index, f"科目{number}", severity, problem)
+
+
+def check_students(report, records, roster):
+    students = _group((r.gakuseki, r.name) for r in records)
+    for (gakuseki, name), indexes in students.items():
+        if gakuseki:
+            row = roster.by_gakuseki.get(gakuseki)
+            if row is None:
+                report.add_rows(indexes, "学籍番号", ERROR, f"名簿にありません: {gakuseki}")
+            elif _normalize_name(roster.columns["氏名"][row]) != _normalize_name(name):
+                report.add_rows(indexes, "氏名", ERROR,
+                                f"学籍番号 {gakuseki} の氏名は {roster.columns['氏名'][row]} です: {name}")
+        elif not name:
+            report.add_rows(indexes, "氏名", ERROR, "氏名・学籍番号が未入力です")
+        elif name not in roster.by_name:
+            report.add_rows(indexes, "氏名", WARNING, f"名簿にありません（学籍番号も未入力）: {name}")
+
+
+def check_widths(report, records, application_type, slots):
+    """文字列が枠に収まるかを FormDrawer に確認させる（レコードは slots の順に面へ割り当てる）"""
+    from layout_plan import supports_text_fits # FormDrawer・PILを使うのでここで読み込む
+    from template_cache import get_drawer, get_plans
+
+    plans = get_plans(application_type)
+    drawer = get_drawer()
+    if plans is None or not supports_text_fits(drawer):
+        report.notes.append("FormDrawer が幅の確認（text_fits）に対応していないため、幅は確認していません")
+        return
+    drawer_data = [record.to_drawer_data() for record in records]
+    for offset, slot in enumerate(slots):
+        plan = plans.get(slot)
+        if plan is None:
+            report.notes.append(f"面 {slot} のレイアウトプランがないため、幅は確認していません")
+            continue
+        rows = range(offset, len(records), len(slots))
+        slot_data = drawer_data[offset::len(slots)]
+        for key in sorted(set().union(*slot_data)): # 行き・帰りの区分によってキーが違う
+            column = [str(data.get(key) or "") for data in slot_data]
+            # 異なる値だけを確認し、収まらない値があった場合だけレコードを探す
+            overflow = {text for text in set(column) if text and not drawer.text_fits(plan, key, text)}
+            for text in overflow:
+                indexes = [rows[i] for i, value in enumerate(column) if value == text]
+                report.add_rows(indexes, key, ERROR, f"枠に収まりません: {text}")
+
+
+def validate_records(records, reference=None, application_type="out", slots=None):
+    """レコード（FormRecordのリスト）をまとめて確認し、ValidationReport を返す
+
+    reference（ReferenceData）を渡すと科目・名簿も確認する。slots を渡すと
+    その順に面へ割り当てたときの枠の幅も確認する。
+    """
+    report = ValidationReport(len(records))
+    check_dates(report, records)
+    check_times(report, records)
+    if reference is not None:
+        if reference.subject_names:
+            check_subjects(report, records, reference)
+        else:
+            report.notes.append("科目の一覧がないため、科目・教員は確認していません")
+        if len(reference.roster):
+            check_students(report, records, reference.roster)
+        else:
+            report.notes.append("名簿がないため、学生は確認していません")
+    if slots:
+        try:
+            check_widths(report, records, application_type, slots)
+        except OSError as e:
+            report.notes.append(f"フォントまたは位置JSONを読めないため、幅は確認していません: {e}")
+    return report